@@ -0,0 +1,215 @@
+"""Кеш в файле SQLite, общий для всех процессов на одной машине.
+
+LocMemCache у каждого воркера gunicorn свой, поэтому попадания падают
+с ростом числа воркеров, а инвалидация не доходит до соседей. Этот
+бэкенд держит записи в одном файле SQLite в режиме WAL: читатели не
+блокируют писателя, целые числа хранятся как INTEGER и увеличиваются
+атомарно одним UPDATE, а при переполнении вытесняются давно не
+читавшиеся записи (приближённый LRU).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# как часто (в секундах) обновлять время последнего чтения записи
+LRU_RESOLUTION = 1.0
+# раз в сколько записей проверять переполнение
+CULL_EVERY = 100
+# предел числа параметров в одном запросе SQLite
+MAX_VARIABLES = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+
+
+def _dump(value):
+    # целые числа храним как есть, чтобы incr работал в SQL
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._sets = 0
+
+    def _connection(self):
+        # соединение своё у каждого потока и у каждого форка процесса
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, _dump(value), self._expiry(timeout), now, now))
+        added = cursor.rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        conn = self._connection()
+        now = time.time()
+        found = {}
+        expired = []
+        touched = []
+        for start in range(0, len(keys), MAX_VARIABLES):
+            chunk = keys[start:start + MAX_VARIABLES]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({placeholders})', chunk)
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    expired.append(key)
+                    continue
+                found[key] = _load(value)
+                if now - accessed > LRU_RESOLUTION:
+                    touched.append(key)
+        if touched:
+            conn.executemany('UPDATE cache SET accessed = ? WHERE key = ?',
+                             [(now, key) for key in touched])
+        if expired:
+            conn.executemany(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                [(key, now) for key in expired])
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self._expiry(timeout)
+        rows = [(self._key(key, version), _dump(value), expires, now)
+                for key, value in data.items()]
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', rows)
+        self._maybe_cull()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), now, key, now))
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(
+                'UPDATE cache SET value = value + ?, accessed = ? '
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, now, key, now))
+            if cursor.rowcount != 1:
+                raise ValueError(f"Key '{key}' not found")
+            return conn.execute('SELECT value FROM cache WHERE key = ?',
+                                (key,)).fetchone()[0]
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        self._connection().executemany('DELETE FROM cache WHERE key = ?',
+                                       keys)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._get_many([key])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % CULL_EVERY == 0:
+            self.cull()
+
+    def cull(self):
+        """Удаляет просроченные и самые давно читавшиеся записи."""
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache WHERE expires <= ?',
+                         (time.time(),))
+            count = conn.execute('SELECT count(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                conn.execute('DELETE FROM cache')
+                return
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)',
+                (max(count // self._cull_frequency,
+                     count - self._max_entries),))
+
+    def close(self, **kwargs):
+        # соединение живёт всё время работы потока, как у LocMemCache
+        pass
@@ -0,0 +1,57 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. С реплик читают
+только веб-запросы, которые PrimaryPinMiddleware открепила от основной
+базы; команды, миграции и фоновые потоки всегда работают с default.
+Запрос, который сам пишет или пришёл вскоре после записи того же
+пользователя, тоже читает из default, чтобы автор сразу видел свою
+правку несмотря на отставание реплик.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = threading.local()
+
+
+def start_request(pinned):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def reset():
+    _state.__dict__.clear()
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True)
+
+
+def wrote():
+    """Писал ли текущий запрос в базу."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or is_pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        # после записи этот же запрос читает свои данные из default
+        _state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики получают схему вместе с данными от основной базы
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+COUNTER_KEY = 'bench:counter'
+
+
+def _make_cache(config, location):
+    params = dict(config)
+    backend = import_string(params.pop('BACKEND'))
+    params.pop('LOCATION', None)
+    return backend(location, params)
+
+
+def _worker(config, location, ops, keys, seed, queue):
+    """Имитирует воркер gunicorn: читает страницу, на промахе кладёт."""
+    cache = _make_cache(config, location)
+    rng = random.Random(seed)
+    page = 'x' * 2048
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(ops):
+        # популярные страницы читаются чаще (примерно по Ципфу)
+        key = f'bench:{int(rng.paretovariate(1.2)) % keys}'
+        if cache.get(key) is None:
+            cache.set(key, page, 300)
+        else:
+            hits += 1
+        try:
+            cache.incr(COUNTER_KEY)
+        except ValueError:
+            cache.add(COUNTER_KEY, 0, None)
+            cache.incr(COUNTER_KEY)
+    queue.put((hits, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает бэкенды кеша под нагрузкой из нескольких '
+            'процессов: пропускная способность, попадания и атомарность '
+            'incr')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default='locmem,filebased,sqlite')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--ops', type=int, default=5000,
+                            help='операций на процесс')
+        parser.add_argument('--keys', type=int, default=500,
+                            help='число различных страниц')
+
+    def handle(self, *args, **options):
+        names = options['backends'].split(',')
+        unknown = set(names) - set(settings.CACHE_BACKENDS)
+        if unknown:
+            raise CommandError(f'Неизвестные бэкенды: {", ".join(unknown)}')
+        workers, ops = options['workers'], options['ops']
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f'{"бэкенд":<10} {"оп/с":>10} {"попадания":>10} '
+                          f'{"incr":>10}')
+        for name in names:
+            config = settings.CACHE_BACKENDS[name]
+            with tempfile.TemporaryDirectory() as directory:
+                location = os.path.join(directory, 'cache.sqlite3'
+                                        if name == 'sqlite' else 'files')
+                queue = context.Queue()
+                processes = [
+                    context.Process(target=_worker, args=(
+                        config, location, ops, options['keys'], seed, queue))
+                    for seed in range(workers)
+                ]
+                for process in processes:
+                    process.start()
+                results = [queue.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                # итог счётчика виден только общему кешу; у locmem
+                # каждый процесс считал своё
+                counter = _make_cache(config, location).get(COUNTER_KEY, 0)
+            hits = sum(hit for hit, _ in results)
+            elapsed = max(seconds for _, seconds in results)
+            self.stdout.write(
+                f'{name:<10} {workers * ops / elapsed:>10.0f} '
+                f'{hits / (workers * ops):>10.1%} '
+                f'{counter:>5}/{workers * ops:<5}')
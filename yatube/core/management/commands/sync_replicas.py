@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик через '
+            'backup API: локальная замена настоящей репликации')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='повторять каждые N секунд '
+                                 '(имитация отставания реплик)')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [settings.DATABASES[alias]
+                    for alias in settings.DATABASE_REPLICAS]
+        if any(database['ENGINE'] != 'django.db.backends.sqlite3'
+               for database in [primary, *replicas]):
+            raise CommandError('Копирование поддерживает только SQLite')
+        if not replicas:
+            raise CommandError('Реплики не заданы: укажите пути к файлам '
+                               'в YATUBE_REPLICAS через запятую')
+        while True:
+            started = time.perf_counter()
+            source = sqlite3.connect(primary['NAME'])
+            try:
+                for replica in replicas:
+                    target = sqlite3.connect(replica['NAME'])
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(
+                f'Реплик обновлено: {len(replicas)} за '
+                f'{time.perf_counter() - started:.2f} с')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,190 @@
+"""Метрики запросов, которые собирает PerformanceMiddleware.
+
+На каждый запрос заводится RequestProfile в thread-local: время SQL
+считает execute_wrapper, время шаблонов и попадания в кеш - обёртки,
+которые install() один раз ставит на Template.render и на класс
+бэкенда кеша. Итоги копятся по имени view в гистограммах внутри
+процесса: запись - несколько сложений под блокировкой.
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.template.backends.django import Template
+
+# верхние границы корзин гистограммы, мс
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+           float('inf'))
+
+_local = threading.local()
+_MISSING = object()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # вложенные рендеры и вызовы кеша считаем один раз
+        self.render_depth = 0
+        self.cache_depth = 0
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+def start():
+    _local.profile = RequestProfile()
+    return _local.profile
+
+
+def stop():
+    _local.profile = None
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        profile = current()
+        if profile is None or profile.render_depth:
+            return render(self, *args, **kwargs)
+        profile.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - started
+            profile.render_depth -= 1
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        profile = current()
+        if profile is None or profile.cache_depth:
+            return get(self, key, default, version)
+        profile.cache_depth += 1
+        try:
+            value = get(self, key, _MISSING, version)
+        finally:
+            profile.cache_depth -= 1
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        profile = current()
+        if profile is None or profile.cache_depth:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        profile.cache_depth += 1
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            profile.cache_depth -= 1
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Ставит обёртки замеров; повторный вызов ничего не делает."""
+    if getattr(Template.render, 'metered', False):
+        return
+    Template.render = _timed_render(Template.render)
+    Template.render.metered = True
+    backend = type(caches['default'])
+    backend.get = _counted_get(backend.get)
+    backend.get_many = _counted_get_many(backend.get_many)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попал перцентиль."""
+        if not self.total:
+            return 0
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= share * self.total:
+                return bound
+        return BUCKETS[-1]
+
+
+class ViewStats:
+    def __init__(self):
+        self.wall = Histogram()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self, name):
+        requests = self.wall.total or 1
+        return {
+            'view': name,
+            'requests': self.wall.total,
+            'p50_ms': self.wall.percentile(0.5),
+            'p95_ms': self.wall.percentile(0.95),
+            'p99_ms': self.wall.percentile(0.99),
+            'mean_ms': self.wall.sum / requests,
+            'queries': self.queries / requests,
+            'sql_ms': self.sql_time * 1000 / requests,
+            'template_ms': self.template_time * 1000 / requests,
+            'cache_hit_ratio': (self.cache_hits
+                                / ((self.cache_hits + self.cache_misses)
+                                   or 1)),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, wall, queries, profile):
+        with self._lock:
+            stats = self._views.get(view_name)
+            if stats is None:
+                stats = self._views[view_name] = ViewStats()
+            stats.wall.add(wall * 1000)
+            stats.queries += queries.queries
+            stats.sql_time += queries.duration
+            stats.template_time += profile.template_time
+            stats.cache_hits += profile.cache_hits
+            stats.cache_misses += profile.cache_misses
+
+    def snapshot(self):
+        with self._lock:
+            return sorted((stats.as_dict(name)
+                           for name, stats in self._views.items()),
+                          key=lambda row: -row['requests'])
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import db_routers, metrics
+from .profiling import QueryCounter, on_all_databases
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет чтения за основной базой после записи.
+
+    Запрос, изменивший данные, ставит cookie на REPLICA_PIN_SECONDS;
+    пока она жива, все запросы пользователя читают из default.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_routers.start_request(
+            pinned=(request.method not in ('GET', 'HEAD', 'OPTIONS')
+                    or settings.REPLICA_PIN_COOKIE in request.COOKIES))
+        try:
+            response = self.get_response(request)
+            if settings.DATABASE_REPLICAS and db_routers.wrote():
+                response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                                    max_age=settings.REPLICA_PIN_SECONDS,
+                                    httponly=True)
+        finally:
+            db_routers.reset()
+        return response
+
+
+class PerformanceMiddleware:
+    """Замеряет каждый запрос и копит итоги по имени view.
+
+    Время SQL, шаблонов и обращения к кешу отдаются клиенту в
+    заголовке Server-Timing, сводка по view - на странице /perf/.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.install()
+
+    def __call__(self, request):
+        profile = metrics.start()
+        queries = QueryCounter(count_rows=False)
+        started = time.perf_counter()
+        try:
+            with on_all_databases(queries):
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        wall = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.registry.record(view_name, wall, queries, profile)
+        response['Server-Timing'] = (
+            f'app;dur={wall * 1000:.1f}, '
+            f'db;dur={queries.duration * 1000:.1f};'
+            f'desc="{queries.queries} queries", '
+            f'tpl;dur={profile.template_time * 1000:.1f}, '
+            f'cache;desc="{profile.cache_hits} hit {profile.cache_misses} '
+            f'miss"')
+        return response
@@ -0,0 +1,76 @@
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryCounter:
+    """execute_wrapper: считает SQL-запросы, их время и выбранные строки.
+
+    Подключается через ``connection.execute_wrapper(counter)``.
+    Строки считаются по fetchone/fetchmany/fetchall курсора, то есть
+    ровно те, что ORM забрал из базы; count_rows=False отключает этот
+    подсчёт там, где важна цена самого замера.
+    """
+
+    def __init__(self, count_rows=True):
+        self.queries = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.count_rows = count_rows
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+            if self.count_rows:
+                self._count_rows(context['cursor'])
+
+    def _count_rows(self, cursor):
+        if 'fetchmany' in vars(cursor):
+            return
+        counter = self
+
+        def fetchone():
+            row = cursor.cursor.fetchone()
+            if row is not None:
+                counter.rows += 1
+            return row
+
+        def fetchmany(size=cursor.cursor.arraysize):
+            rows = cursor.cursor.fetchmany(size)
+            counter.rows += len(rows)
+            return rows
+
+        def fetchall():
+            rows = cursor.cursor.fetchall()
+            counter.rows += len(rows)
+            return rows
+
+        cursor.fetchone = fetchone
+        cursor.fetchmany = fetchmany
+        cursor.fetchall = fetchall
+
+
+class QueryLog:
+    """execute_wrapper: запоминает выполненные запросы с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def on_all_databases(wrapper):
+    """Подключает execute_wrapper ко всем базам, включая реплики."""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield wrapper
@@ -0,0 +1,174 @@
+import os
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from . import db_routers
+from .metrics import Histogram, registry
+from .cache_backends import SQLiteCache
+from .middleware import PrimaryPinMiddleware
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_get_set_delete(self):
+        """Базовые операции и get_many."""
+        self.cache.set('a', {'page': 1})
+        self.cache.set_many({'b': 'two', 'c': 3})
+        self.assertEqual(self.cache.get('a'), {'page': 1})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'missing']),
+                         {'a': {'page': 1}, 'b': 'two', 'c': 3})
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр (другой процесс) видит те же записи."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(self.make_cache().get('shared'), 'value')
+
+    def test_expiry_and_add(self):
+        """add не перезаписывает живую запись, но занимает просроченную."""
+        self.assertTrue(self.cache.add('lock', 1, 0.05))
+        self.assertFalse(self.cache.add('lock', 2))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('lock'))
+        self.assertTrue(self.cache.add('lock', 3))
+        self.assertEqual(self.cache.get('lock'), 3)
+
+    def test_incr(self):
+        """incr атомарно увеличивает число и падает на пустом ключе."""
+        self.cache.set('gen', 10, None)
+        self.assertEqual(self.cache.incr('gen'), 11)
+        self.assertEqual(self.make_cache().incr('gen', 5), 16)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set_many({f'old{i}': i for i in range(10)})
+        time.sleep(0.01)
+        cache.set('hot', 'x')
+        cache.cull()
+        self.assertEqual(cache.get('hot'), 'x')
+        self.assertLessEqual(
+            len(cache.get_many([f'old{i}' for i in range(10)])), 5)
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db_routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        db_routers.reset()
+
+    def tearDown(self):
+        db_routers.reset()
+
+    def run_view(self, request, write=False):
+        """Прогоняет запрос через middleware, возвращает (ответ, база)."""
+        used = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(None)
+            used.append(self.router.db_for_read(None))
+            return HttpResponse()
+        return PrimaryPinMiddleware(view)(request), used[0]
+
+    def test_reads_go_to_replica(self):
+        """Чтение без записи уходит на реплику, запись - в default."""
+        # вне веб-запроса читаем только основную базу
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        db_routers.start_request(pinned=False)
+        self.assertEqual(self.router.db_for_read(None), 'replica0')
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        # после записи тот же запрос читает своё из default
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_write_pins_following_reads(self):
+        """После записи пользователь какое-то время читает из default."""
+        response, database = self.run_view(self.factory.post('/'),
+                                           write=True)
+        self.assertEqual(database, 'default')
+        cookie = response.cookies['pin_primary']
+        self.assertEqual(cookie['max-age'], 5)
+
+        request = self.factory.get('/')
+        request.COOKIES['pin_primary'] = cookie.value
+        response, database = self.run_view(request)
+        self.assertEqual(database, 'default')
+        self.assertNotIn('pin_primary', response.cookies)
+
+        response, database = self.run_view(self.factory.get('/'))
+        self.assertEqual(database, 'replica0')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё идёт в default и cookie не ставится."""
+        response, database = self.run_view(self.factory.post('/'),
+                                           write=True)
+        self.assertEqual(database, 'default')
+        self.assertNotIn('pin_primary', response.cookies)
+
+
+class PerformanceMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def stats(self, view_name):
+        return next(row for row in registry.snapshot()
+                    if row['view'] == view_name)
+
+    def test_server_timing_and_registry(self):
+        """Запрос попадает в заголовок и в сводку по имени view."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        timing = response['Server-Timing']
+        self.assertIn('app;dur=', timing)
+        self.assertIn('queries', timing)
+        self.assertIn('tpl;dur=', timing)
+        # второй раз страница берётся из кеша
+        self.client.get(url)
+        stats = self.stats('posts:index')
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['template_ms'], 0)
+        self.assertGreater(stats['cache_hit_ratio'], 0)
+
+    def test_page_is_staff_only(self):
+        user = get_user_model().objects.create_user(username='user')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/perf/').status_code, 302)
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse('posts:index'))
+        response = self.client.get('/perf/')
+        self.assertContains(response, 'posts:index')
+        self.client.post('/perf/')
+        self.assertEqual(registry.snapshot()[0]['view'], 'performance')
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for value in [0.5] * 90 + [30] * 9 + [4000]:
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(0.5), 1)
+        self.assertEqual(histogram.percentile(0.95), 50)
+        self.assertEqual(histogram.percentile(1), 5000)
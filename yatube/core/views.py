@@ -1,4 +1,7 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+
+from .metrics import registry
 
 
 def page_not_found(request, exception):
@@ -9,3 +12,12 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def performance(request):
+    if request.method == 'POST':
+        registry.reset()
+        return redirect('performance')
+    return render(request, 'core/performance.html',
+                  {'views': registry.snapshot()})
@@ -0,0 +1,341 @@
+"""Холодный архив старых постов в отдельном файле SQLite.
+
+Посты старше ARCHIVE_AFTER_DAYS вместе с комментариями переезжают из
+posts_post в ARCHIVE_PATH пачками (manage.py archive_posts): строка на
+пост с ключами лент (автор, группа, дата, id) в открытом виде и
+сжатым zlib JSON с текстом, картинкой и комментариями. Горячая таблица
+и её индексы остаются маленькими.
+
+Ленты листаются без швов: CursorPaginator и Paginator сливают
+горячие и архивные посты по тем же (pub_date, id). Обычно архив
+старше горячей таблицы, и в него заглядывают, только когда горячие
+посты кончились; старые посты, импортированные после архивации, тоже
+встают на своё место. Страница поста и её комментарии читаются из
+архива; комментировать архивный пост нельзя, а поиск, рейтинг и ленты
+подписок знают только горячие посты. Выгрузки автора и группы
+(posts.export) идут по архиву вслед за горячими строками.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching
+from .models import (Comment, FeedItem, Group, Post, PostScore, PostStats,
+                     User)
+from .search import FTS_TABLE
+from .search import is_supported as fts_supported
+from .utils import CursorPage, decode_cursor, encode_cursor
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+COMPRESS_LEVEL = 9
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS archived_post ('
+    'id INTEGER PRIMARY KEY, author_id INTEGER NOT NULL, '
+    'group_id INTEGER, pub_date INTEGER NOT NULL, '
+    'comments_count INTEGER NOT NULL, data BLOB NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS archived_pub_date_idx '
+    'ON archived_post (pub_date, id)',
+    'CREATE INDEX IF NOT EXISTS archived_author_idx '
+    'ON archived_post (author_id, pub_date, id)',
+    'CREATE INDEX IF NOT EXISTS archived_group_idx '
+    'ON archived_post (group_id, pub_date, id)',
+)
+COLUMNS = 'id, author_id, group_id, pub_date, comments_count, data'
+
+_local = threading.local()
+
+
+def _to_int(value):
+    # микросекунды с эпохи: сравниваются как числа без потерь точности
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_int(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _connection(create=False):
+    """Соединение потока с архивом; None, если архива ещё нет."""
+    path = settings.ARCHIVE_PATH
+    # соединение своё у каждого потока и у каждого форка процесса
+    if getattr(_local, 'key', None) == (path, os.getpid()):
+        return _local.conn
+    if not create and not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    _local.conn, _local.key = conn, (path, os.getpid())
+    return conn
+
+
+def _query(sql, params):
+    conn = _connection()
+    if conn is None:
+        return []
+    return conn.execute(sql, params).fetchall()
+
+
+def _pack(post, comments):
+    data = {
+        'text': post.text,
+        'image': post.image.name or '',
+        'updated': _to_int(post.updated),
+        'comments': [[comment.id, comment.author_id, comment.text,
+                      _to_int(comment.created)] for comment in comments],
+    }
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode(),
+                         COMPRESS_LEVEL)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode())
+
+
+def _materialize(rows, with_comments=False):
+    """Post без сохранения в базу, с автором и группой как у for_listing.
+
+    with_comments - ещё и список archived_comments: Comment без
+    сохранения, от старых к новым.
+    """
+    rows = list(rows)
+    unpacked = [_unpack(row[5]) for row in rows]
+    author_ids = {row[1] for row in rows}
+    if with_comments:
+        author_ids.update(item[1] for data in unpacked
+                          for item in data['comments'])
+    authors = User.objects.in_bulk(author_ids)
+    group_ids = {row[2] for row in rows} - {None}
+    groups = Group.objects.in_bulk(group_ids) if group_ids else {}
+    posts = []
+    for row, data in zip(rows, unpacked):
+        post_id, author_id, group_id, pub_date = row[:4]
+        if author_id not in authors:
+            # автор удалён вместе с аккаунтом
+            continue
+        post = Post(id=post_id, author_id=author_id, group_id=group_id,
+                    text=data['text'], image=data['image'],
+                    pub_date=_from_int(pub_date),
+                    updated=_from_int(data['updated']))
+        post._state.adding = False
+        post.author = authors[author_id]
+        post.group = groups.get(group_id)
+        post.archived = True
+        if with_comments:
+            post.archived_comments = [
+                Comment(id=comment_id, post_id=post_id,
+                        author=authors[comment_author], text=text,
+                        created=_from_int(created))
+                for comment_id, comment_author, text, created
+                in sorted(data['comments'],
+                          key=lambda item: (item[3], item[0]))
+                if comment_author in authors]
+        posts.append(post)
+    return posts
+
+
+class ArchivedPosts:
+    """Архивное продолжение ленты: всех постов, автора или группы."""
+
+    def __init__(self, author_id=None, group_id=None):
+        self._max_key = False
+        self.where, self.params = ['1'], []
+        if author_id is not None:
+            self.where.append('author_id = ?')
+            self.params.append(author_id)
+        if group_id is not None:
+            self.where.append('group_id = ?')
+            self.params.append(group_id)
+
+    def _select(self, condition, params, order, limit, offset=0):
+        where = ' AND '.join(self.where + condition)
+        return _materialize(_query(
+            f'SELECT {COLUMNS} FROM archived_post WHERE {where} '
+            f'ORDER BY pub_date {order}, id {order} LIMIT ? OFFSET ?',
+            self.params + params + [limit, offset]))
+
+    def count(self):
+        rows = _query('SELECT count(*) FROM archived_post WHERE '
+                      + ' AND '.join(self.where), self.params)
+        return rows[0][0] if rows else 0
+
+    def max_key(self):
+        """(дата, id) самого нового поста ленты в архиве или None."""
+        if self._max_key is False:
+            rows = _query('SELECT pub_date, id FROM archived_post WHERE '
+                          + ' AND '.join(self.where)
+                          + ' ORDER BY pub_date DESC, id DESC LIMIT 1',
+                          self.params)
+            self._max_key = None
+            if rows:
+                self._max_key = (_from_int(rows[0][0]), rows[0][1])
+        return self._max_key
+
+    def slice(self, offset, limit):
+        """Посты с offset по offset + limit, от новых к старым."""
+        return self._select([], [], 'DESC', limit, offset)
+
+    def older(self, key, limit):
+        """До limit постов старше ключа (дата, id), от новых к старым."""
+        if key is None:
+            return self._select([], [], 'DESC', limit)
+        value, pk = _to_int(key[0]), key[1]
+        return self._select(['(pub_date < ? OR pub_date = ? AND id < ?)'],
+                            [value, value, pk], 'DESC', limit)
+
+    def chunks(self, size, with_comments=False):
+        """Все посты ленты от старых к новым, списками до size штук."""
+        where, params = ' AND '.join(self.where), []
+        after = ''
+        while True:
+            rows = _query(
+                f'SELECT {COLUMNS} FROM archived_post WHERE {where}{after} '
+                f'ORDER BY pub_date, id LIMIT ?',
+                self.params + params + [size])
+            if not rows:
+                return
+            # ключ берём из строк архива: посты удалённых авторов
+            # выпадают из порции, но не обрывают обход
+            yield _materialize(rows, with_comments)
+            value, pk = rows[-1][3], rows[-1][0]
+            after = ' AND (pub_date > ? OR pub_date = ? AND id > ?)'
+            params = [value, value, pk]
+
+    def newer(self, key, limit):
+        """До limit постов новее ключа (дата, id), от старых к новым."""
+        value, pk = _to_int(key[0]), key[1]
+        return self._select(['(pub_date > ? OR pub_date = ? AND id > ?)'],
+                            [value, value, pk], 'ASC', limit)
+
+
+def _row(post_id):
+    rows = _query(f'SELECT {COLUMNS} FROM archived_post WHERE id = ?',
+                  [post_id])
+    return rows[0] if rows else None
+
+
+def author_username(post_id):
+    rows = _query('SELECT author_id FROM archived_post WHERE id = ?',
+                  [post_id])
+    if not rows:
+        return None
+    return (User.objects.filter(pk=rows[0][0])
+            .values_list('username', flat=True).first())
+
+
+def load_post(post_id):
+    """(пост, число комментариев) из архива или None."""
+    row = _row(post_id)
+    posts = _materialize([row]) if row else []
+    if not posts:
+        return None
+    return posts[0], row[4]
+
+
+def comments_page(post_id, after=None, per_page=20):
+    """Порция комментариев архивного поста или None, если его нет."""
+    row = _row(post_id)
+    if row is None:
+        return None
+    comments = sorted(_unpack(row[5])['comments'],
+                      key=lambda item: (item[3], item[0]), reverse=True)
+    after_key = decode_cursor(after)
+    if after_key:
+        key = (_to_int(after_key[0]), after_key[1])
+        comments = [item for item in comments
+                    if (item[3], item[0]) < key]
+    comments = comments[:per_page + 1]
+    authors = User.objects.in_bulk({item[1] for item in comments})
+    page = []
+    for comment_id, author_id, text, created in comments[:per_page]:
+        if author_id in authors:
+            page.append(Comment(id=comment_id, post_id=post_id,
+                                author=authors[author_id], text=text,
+                                created=_from_int(created)))
+    next_cursor = None
+    if len(comments) > per_page and page:
+        next_cursor = encode_cursor(page[-1], ('created', 'id'))
+    return CursorPage(page, next_cursor)
+
+
+def counts_by_author():
+    """{author_id: число архивных постов} для сверки счётчиков."""
+    return dict(_query('SELECT author_id, count(*) FROM archived_post '
+                       'GROUP BY author_id', []))
+
+
+def count_for_author(author_id):
+    return ArchivedPosts(author_id=author_id).count()
+
+
+def _delete_hot(ids, comment_ids):
+    # без сигналов: счётчик постов автора учитывает и архив, а страницы
+    # сбрасываются одним bump на всю пачку. Комментарии удаляем только
+    # скопированные: если появился новый, внешний ключ не даст
+    # закоммитить удаление поста, и пачка откатится целиком
+    with connection.cursor() as cursor:
+        for start in range(0, len(comment_ids), 500):
+            chunk = comment_ids[start:start + 500]
+            cursor.execute(f'DELETE FROM {Comment._meta.db_table} WHERE id '
+                           f'IN ({", ".join(["%s"] * len(chunk))})', chunk)
+        marks = ', '.join(['%s'] * len(ids))
+        for model, column in [(FeedItem, 'post_id'), (PostStats, 'post_id'),
+                              (PostScore, 'post_id'), (Post, 'id')]:
+            cursor.execute(f'DELETE FROM {model._meta.db_table} '
+                           f'WHERE {column} IN ({marks})', ids)
+        if fts_supported():
+            cursor.execute(f'DELETE FROM {FTS_TABLE} '
+                           f'WHERE rowid IN ({marks})', ids)
+
+
+def archive_batch(cutoff, batch=500):
+    """Переносит в архив до batch постов старше cutoff; их число."""
+    with transaction.atomic():
+        # строки постов заблокированы до конца транзакции, и новый
+        # комментарий к ним ждёт (в SQLite запись и так одна на базу)
+        posts = list(Post.objects.select_for_update(of=('self',))
+                     .filter(pub_date__lt=cutoff)
+                     .select_related('author', 'group')
+                     .order_by('pub_date', 'id')[:batch])
+        if not posts:
+            return 0
+        ids = [post.pk for post in posts]
+        comments = {}
+        for comment in (Comment.objects.filter(post_id__in=ids)
+                        .order_by('pk')):
+            comments.setdefault(comment.post_id, []).append(comment)
+        rows = [(post.pk, post.author_id, post.group_id,
+                 _to_int(post.pub_date), len(comments.get(post.pk, [])),
+                 _pack(post, comments.get(post.pk, [])))
+                for post in posts]
+        # сначала архив: если горячая транзакция откатится, пост просто
+        # лежит в обоих местах, ленты показывают горячую копию, а повтор
+        # перезапишет строку архива
+        conn = _connection(create=True)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO archived_post '
+                             f'({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        _delete_hot(ids, [comment.pk for post_comments in comments.values()
+                          for comment in post_comments])
+        caching.bump('index',
+                     *{f'user:{post.author.username}' for post in posts},
+                     *{f'group:{post.group.slug}' for post in posts
+                       if post.group},
+                     *(f'post:{post_id}' for post_id in ids))
+    return len(posts)
+
+
+def cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
@@ -0,0 +1,45 @@
+"""Помощники массовой загрузки через bulk_create.
+
+bulk_create не отправляет сигналов, поэтому после загрузки ленты,
+счётчики, поисковый индекс, рейтинг, кеш страниц и их снимки нужно
+досчитать отдельно.
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import counters, feed, ranking, search, snapshots, suggestions
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даёт bulk_create записать свои даты в auto_now_add-поля."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def after_bulk_load():
+    """Досчитывает то, что при обычной записи делают сигналы.
+
+    Возвращает список (шаг, функция) для замера каждого шага.
+    """
+    steps = [
+        # ленты зависят от счётчиков подписчиков (тяжёлые авторы)
+        ('счётчики', counters.reconcile),
+        ('ленты', feed.rebuild),
+        ('поиск', search.rebuild_index),
+        ('рейтинг', ranking.rescore),
+        ('рекомендации', suggestions.rebuild),
+        ('кеш', cache.clear),
+    ]
+    if settings.SNAPSHOTS_ENABLED:
+        # снимки рендерятся через кеш страниц, поэтому после его сброса
+        steps.append(('снимки', lambda: snapshots.publish_all(
+            settings.SNAPSHOTS_LIMIT)))
+    return steps
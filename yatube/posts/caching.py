@@ -0,0 +1,205 @@
+"""Поколенческий кеш страниц.
+
+Каждая страница зависит от набора областей ('index', 'group:<slug>',
+'user:<username>', 'post:<id>'). У области есть счётчик поколения в
+кеше; ключ страницы включает текущие поколения её областей. Сигналы
+Post/Comment/Follow/Group увеличивают поколения затронутых областей,
+и старые копии страниц просто перестают находиться, поэтому TTL можно
+держать длинным. Исключение - LocMemCache: поколения там свои у
+каждого процесса, и bump в одном воркере не виден остальным, поэтому
+с ним страницы живут не дольше LOCAL_CACHE_TIMEOUT. Холодную страницу
+пересобирает один воркер, остальные ждут его результат.
+
+Тот же ключ служит ETag закешированной страницы: если браузер или CDN
+пришли с совпадающим If-None-Match, отвечаем 304 по чтению из кеша, не
+трогая ни базу, ни шаблоны. Страницы, которые не кешируются (с
+CSRF-токеном или cookie), ETag не получают. Те же области после
+коммита перерисовывают статические снимки страниц для анонимов
+(posts.snapshots).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+from . import snapshots
+from .models import Post
+
+POLL_INTERVAL = 0.05
+MAX_SCOPE_LENGTH = 200
+
+
+def _generation_key(scope):
+    # memcached принимает только ASCII без пробелов и управляющих
+    # символов, а slug и username бывают любыми: такие области хешируем
+    if (scope.isascii() and scope.isprintable() and ' ' not in scope
+            and len(scope) <= MAX_SCOPE_LENGTH):
+        return f'gen:{scope}'
+    return 'gen:md5:' + hashlib.md5(scope.encode()).hexdigest()
+
+
+def _fresh_generation():
+    # поколение, вытесненное из кеша, стартует с текущего времени
+    # и не совпадает ни с одним из выданных раньше
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes):
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _fresh_generation(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def _bumped_key(scope):
+    return _generation_key(scope) + ':bumped'
+
+
+def bump(*scopes):
+    """Инвалидирует все страницы, зависящие от областей scopes."""
+    if settings.DATABASE_REPLICAS:
+        # метка свежей правки рядом с поколением, пока реплики догоняют
+        cache.set_many({_bumped_key(scope): 1 for scope in scopes},
+                       settings.REPLICA_PIN_SECONDS)
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh_generation(), None)
+    snapshots.schedule(scopes)
+
+
+def scoped_timeout(value):
+    """TTL записи, зависящей от поколений, для текущего бэкенда."""
+    if isinstance(caches['default'], LocMemCache):
+        return min(value, settings.LOCAL_CACHE_TIMEOUT)
+    return value
+
+
+def post_author(post_id):
+    """Username автора поста; автор у поста не меняется, храним вечно."""
+    key = f'post-author:{post_id}'
+    username = cache.get(key)
+    if username is None:
+        username = (Post.objects.filter(pk=post_id)
+                    .values_list('author__username', flat=True).first())
+        if username is not None:
+            cache.set(key, username, None)
+    return username
+
+
+def page_scopes(scopes, kwargs):
+    result = []
+    for scope in scopes:
+        if callable(scope):
+            result.extend(scope(kwargs))
+        else:
+            result.append(scope.format(**kwargs))
+    return result
+
+
+def page_variant(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'anon'
+
+
+def page_key(request, view_name, scopes):
+    generations = get_generations(scopes)
+    raw = '|'.join([view_name, request.get_full_path(),
+                    page_variant(request), repr(generations)])
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cacheable(request, response):
+    # страницы с CSRF-токеном или новыми cookie привязаны к сессии
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED'))
+
+
+def _replicas_lagging(scopes):
+    # реплика может ещё не знать о свежей правке областей страницы:
+    # собранная с неё страница закешировалась бы устаревшей под новым
+    # поколением. Правки чужих областей кешу страницы не мешают
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return bool(cache.get_many([_bumped_key(scope) for scope in scopes]))
+
+
+def _with_etag(response, etag):
+    if not response.has_header('ETag'):
+        response['ETag'] = etag
+        # ETag зависит от пользователя из сессии
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _wait_for(key):
+    """Ждёт страницу, которую собирает другой воркер."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        response = cache.get(key)
+        if response is not None:
+            return response
+    return None
+
+
+def cached_page(*scopes):
+    """Кеширует ответ view до смены поколения любой из областей.
+
+    Область - строка-шаблон, который форматируется аргументами view
+    ('group:{slug}'), или функция от этих аргументов, возвращающая
+    список областей. Кроме аргументов view доступен viewer - вариант
+    страницы ('anon' или 'user:<pk>') для областей, своих у каждого
+    читателя.
+    """
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            view_scopes = page_scopes(
+                scopes, dict(kwargs, viewer=page_variant(request)))
+            key = page_key(request, view_name, view_scopes)
+            response = cache.get(key)
+            if response is not None:
+                # ETag есть только у закешированных страниц: страница с
+                # CSRF-токеном или cookie не отвечает 304 на ETag
+                # прошлой сессии того же пользователя
+                not_modified = get_conditional_response(
+                    request, etag=response.get('ETag'))
+                return not_modified or response
+
+            lock_key = key + ':lock'
+            if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+                # страницу уже собирает другой воркер - ждём его
+                response = _wait_for(key)
+                if response is not None:
+                    return response
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+                if (_cacheable(request, response)
+                        and not _replicas_lagging(view_scopes)):
+                    _with_etag(response, quote_etag(key))
+                    cache.set(key, response, scoped_timeout(
+                        settings.PAGE_CACHE_TIMEOUT))
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,132 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются одним UPDATE ... SET x = x + 1 в сигналах
+Post/Comment/Follow, так что профиль и страница поста читают готовые
+числа вместо COUNT(*) по таблицам. Строка счётчиков создаётся лениво
+с честным пересчётом; расхождения чинит команда reconcile_counters.
+Число постов автора включает и его посты в архиве (posts.archive).
+"""
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import archive
+from .models import Comment, Follow, Post, PostStats, UserStats
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def count_user(user_id):
+    return {
+        'posts_count': (Post.objects.filter(author=user_id).count()
+                        + archive.count_for_author(user_id)),
+        'followers_count': Follow.objects.filter(author=user_id).count(),
+        'following_count': Follow.objects.filter(user=user_id).count(),
+    }
+
+
+def count_post(post_id):
+    return {
+        'comments_count': Comment.objects.filter(post=post_id).count(),
+    }
+
+
+def _bump(model, pk, field, delta, recount):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        # не уходим ниже нуля, если счётчик уже разошёлся с данными
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    with transaction.atomic():
+        updated = queryset.update(**{field: F(field) + delta})
+        if not updated and delta > 0:
+            # строки ещё нет: пересчёт уже учитывает новую запись
+            model.objects.get_or_create(pk=pk, defaults=recount(pk))
+
+
+def bump_user(user_id, field, delta):
+    _bump(UserStats, user_id, field, delta, count_user)
+
+
+def bump_post(post_id, delta):
+    _bump(PostStats, post_id, 'comments_count', delta, count_post)
+
+
+def user_stats(user):
+    """Счётчики пользователя; без лишнего запроса при select_related."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            pk=user.pk, defaults=count_user(user.pk))
+        return stats
+
+
+def post_stats(post):
+    """Счётчики поста; без лишнего запроса при select_related."""
+    try:
+        return post.stats
+    except PostStats.DoesNotExist:
+        stats, _ = PostStats.objects.get_or_create(
+            pk=post.pk, defaults=count_post(post.pk))
+        return stats
+
+
+def _grouped(queryset, field):
+    return dict(queryset.values_list(field).annotate(Count('id'))
+                .order_by())
+
+
+def reconcile(fix=True):
+    """Сверяет счётчики с таблицами и возвращает число расхождений."""
+    actual = {
+        'posts_count': _grouped(Post.objects, 'author'),
+        'followers_count': _grouped(Follow.objects, 'author'),
+        'following_count': _grouped(Follow.objects, 'user'),
+    }
+    for author_id, count in archive.counts_by_author().items():
+        actual['posts_count'][author_id] = (
+            actual['posts_count'].get(author_id, 0) + count)
+    drifted = []
+    seen = set()
+    for stats in UserStats.objects.iterator():
+        seen.add(stats.pk)
+        changed = False
+        for field in USER_FIELDS:
+            value = actual[field].get(stats.pk, 0)
+            if getattr(stats, field) != value:
+                setattr(stats, field, value)
+                changed = True
+        if changed:
+            drifted.append(stats)
+    missing = set().union(*actual.values()) - seen
+    created = [
+        UserStats(pk=user_id, **{field: actual[field].get(user_id, 0)
+                                 for field in USER_FIELDS})
+        for user_id in missing
+    ]
+
+    comments = _grouped(Comment.objects, 'post')
+    drifted_posts = []
+    seen = set()
+    for stats in PostStats.objects.iterator():
+        seen.add(stats.pk)
+        value = comments.get(stats.pk, 0)
+        if stats.comments_count != value:
+            stats.comments_count = value
+            drifted_posts.append(stats)
+    created_posts = [PostStats(pk=post_id, comments_count=value)
+                     for post_id, value in comments.items()
+                     if post_id not in seen]
+
+    if fix:
+        with transaction.atomic():
+            UserStats.objects.bulk_update(drifted, USER_FIELDS,
+                                          batch_size=500)
+            UserStats.objects.bulk_create(created, batch_size=500,
+                                          ignore_conflicts=True)
+            PostStats.objects.bulk_update(drifted_posts,
+                                          ['comments_count'],
+                                          batch_size=500)
+            PostStats.objects.bulk_create(created_posts, batch_size=500,
+                                          ignore_conflicts=True)
+    return (len(drifted) + len(created)
+            + len(drifted_posts) + len(created_posts))
@@ -0,0 +1,82 @@
+"""Данные страницы поста одним заходом.
+
+Пост вместе с автором, группой и счётчиками читается одним запросом,
+первая порция комментариев с авторами - вторым. Собранный результат
+лежит в кеше под ключом из поколений 'post:<id>' и 'user:<автор>':
+повторный просмотр горячего поста не трогает базу, а правка поста,
+комментарий или новый пост автора просто меняют ключ. Поста, которого
+нет в posts_post, ищем в архиве (posts.archive).
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import archive
+from .caching import (_replicas_lagging, get_generations, post_author,
+                      scoped_timeout)
+from .counters import post_stats, user_stats
+from .models import Comment, Post
+from .utils import CursorPaginator
+
+NUM_OF_COMMENTS = 20
+
+PostDetail = namedtuple('PostDetail',
+                        'post author_posts comments_count comments')
+
+
+def scopes(post_id, username):
+    return [f'post:{post_id}', f'user:{username}']
+
+
+def author_username(post_id):
+    """Username автора горячего или архивного поста."""
+    return post_author(post_id) or archive.author_username(post_id)
+
+
+def comments_page(post_id, after=None):
+    # курсор по (created, id): любая порция - один запрос по индексу
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(comments, NUM_OF_COMMENTS, 'created')
+    return paginator.get_page(after=after)
+
+
+def _assemble(post_id):
+    post = (Post.objects.for_listing()
+            .select_related('author__stats', 'stats')
+            .filter(pk=post_id).first())
+    if post is None:
+        return _assemble_archived(post_id)
+    return PostDetail(post=post,
+                      author_posts=user_stats(post.author).posts_count,
+                      comments_count=post_stats(post).comments_count,
+                      comments=comments_page(post_id))
+
+
+def _assemble_archived(post_id):
+    archived = archive.load_post(post_id)
+    if archived is None:
+        return None
+    post, comments_count = archived
+    return PostDetail(post=post,
+                      author_posts=user_stats(post.author).posts_count,
+                      comments_count=comments_count,
+                      comments=archive.comments_page(post_id,
+                                                     per_page=NUM_OF_COMMENTS))
+
+
+def load(post_id):
+    """PostDetail поста или None, если поста нет."""
+    username = author_username(post_id)
+    if username is None:
+        return None
+    post_scopes = scopes(post_id, username)
+    generations = get_generations(post_scopes)
+    key = f'post-detail:{post_id}:' + ':'.join(map(str, generations))
+    detail = cache.get(key)
+    if detail is None:
+        detail = _assemble(post_id)
+        if detail is not None and not _replicas_lagging(post_scopes):
+            cache.set(key, detail, scoped_timeout(
+                settings.POST_DETAIL_CACHE_TIMEOUT))
+    return detail
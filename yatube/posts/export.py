@@ -0,0 +1,102 @@
+"""Потоковая выгрузка постов и комментариев в NDJSON и CSV.
+
+Строки читаются серверным курсором (.iterator()) порциями по
+CHUNK_SIZE и сразу превращаются в текст, поэтому память не растёт с
+размером выгрузки: ни queryset, ни результат целиком не хранятся.
+Архивные посты автора или группы (posts.archive) и их комментарии
+идут после горячих теми же порциями.
+"""
+import csv
+import itertools
+import json
+
+from .models import Comment
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+KINDS = ('posts', 'comments')
+FIELDS = {
+    'posts': ('id', 'author', 'group', 'pub_date', 'text', 'image'),
+    'comments': ('id', 'post', 'author', 'created', 'text'),
+}
+
+
+def _posts(posts):
+    # values_list: без экземпляров моделей и без запроса на каждого автора
+    return posts.order_by('pub_date', 'id').values_list(
+        'id', 'author__username', 'group__slug', 'pub_date', 'text', 'image')
+
+
+def _comments(posts):
+    comments = Comment.objects.using(posts.db).filter(
+        post__in=posts.values('id'))
+    # порядок индекса (post, created, id): выгрузка без сортировки
+    return comments.order_by('post', 'created', 'id').values_list(
+        'id', 'post_id', 'author__username', 'created', 'text')
+
+
+def _archived_posts(archived):
+    for chunk in archived.chunks(CHUNK_SIZE):
+        for post in chunk:
+            yield (post.id, post.author.username,
+                   post.group.slug if post.group else None,
+                   post.pub_date, post.text, post.image.name or '')
+
+
+def _archived_comments(archived):
+    for chunk in archived.chunks(CHUNK_SIZE, with_comments=True):
+        for post in chunk:
+            for comment in post.archived_comments:
+                yield (comment.id, post.id, comment.author.username,
+                       comment.created, comment.text)
+
+
+def rows(posts, kind='posts', archived=None):
+    """Словари строк выгрузки для постов queryset'а или их комментариев.
+
+    archived - ArchivedPosts той же выборки, его строки идут следом.
+    """
+    if kind == 'posts':
+        values = _posts(posts).iterator(chunk_size=CHUNK_SIZE)
+        if archived is not None:
+            values = itertools.chain(values, _archived_posts(archived))
+    else:
+        values = _comments(posts).iterator(chunk_size=CHUNK_SIZE)
+        if archived is not None:
+            values = itertools.chain(values, _archived_comments(archived))
+    fields = FIELDS[kind]
+    for row_values in values:
+        row = dict(zip(fields, row_values))
+        for name in ('pub_date', 'created'):
+            if name in row:
+                row[name] = row[name].isoformat()
+        yield row
+
+
+class _Echo:
+    """Буфер для csv.writer, который просто отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[name] for name in fields])
+
+
+def export(posts, kind='posts', fmt='ndjson', archived=None):
+    """Итератор строк выгрузки в формате fmt."""
+    if fmt == 'csv':
+        return csv_lines(rows(posts, kind, archived), FIELDS[kind])
+    return ndjson_lines(rows(posts, kind, archived))
@@ -0,0 +1,190 @@
+"""Лента подписок с раздачей постов при записи (fan-out on write).
+
+Новый пост копируется в FeedItem каждому подписчику автора, поэтому
+follow_index читает одну таблицу по индексу (user, pub_date) вместо
+join'а posts_follow со всеми постами всех авторов. Авторы, у которых
+подписчиков больше FEED_FANOUT_LIMIT, не раздаются: их посты
+подмешиваются в ленту при чтении (гибридный pull). Раздача сама
+держит ленты в пределах FEED_MAX_LENGTH записей.
+"""
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from .models import FeedItem, Follow, Post, UserStats
+
+HEAVY_AUTHORS_KEY = 'feed:heavy-authors'
+HEAVY_AUTHORS_TIMEOUT = 60 * 10
+REBUILD_CHUNK = 200
+
+
+def _count_heavy_authors():
+    return frozenset(
+        UserStats.objects
+        .filter(followers_count__gte=settings.FEED_FANOUT_LIMIT)
+        .values_list('user', flat=True)
+    )
+
+
+def heavy_authors():
+    """Авторы, чьи посты не раздаются по лентам, а читаются напрямую."""
+    return cache.get_or_set(HEAVY_AUTHORS_KEY, _count_heavy_authors,
+                            HEAVY_AUTHORS_TIMEOUT)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if post.author_id in heavy_authors():
+        return
+    follower_ids = Follow.objects.filter(
+        author=post.author_id).values_list('user', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids.iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    _drop_overflow(post.author_id)
+
+
+def _drop_overflow(author_id):
+    """Убирает у подписчиков автора запись, вышедшую за FEED_MAX_LENGTH.
+
+    Раздача добавляет каждому не больше одной записи, поэтому лишней
+    бывает ровно одна - (FEED_MAX_LENGTH + 1)-я по индексу
+    (user, pub_date, post). Один запрос на весь fan-out.
+    """
+    table = FeedItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT (SELECT g.id FROM {table} g '
+            f'WHERE g.user_id = f.user_id '
+            f'ORDER BY g.pub_date DESC, g.post_id DESC LIMIT 1 OFFSET %s) '
+            f'FROM {Follow._meta.db_table} f WHERE f.author_id = %s)',
+            [settings.FEED_MAX_LENGTH, author_id])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту свежие посты автора после подписки."""
+    if author_id in heavy_authors():
+        return
+    posts = (Post.objects.filter(author=author_id)
+             .order_by('-pub_date')
+             .values_list('id', 'pub_date')[:settings.FEED_MAX_LENGTH])
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedItem.objects.filter(user=user_id, post__author=author_id).delete()
+
+
+def trim(user_id):
+    """Обрезает ленту пользователя до FEED_MAX_LENGTH последних записей."""
+    cap = settings.FEED_MAX_LENGTH
+    boundary = (FeedItem.objects.filter(user=user_id)
+                .order_by('-pub_date', '-id')
+                .values_list('pub_date', 'id')[cap:cap + 1])
+    boundary = boundary.first()
+    if boundary is None:
+        return
+    pub_date, item_id = boundary
+    FeedItem.objects.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lte=item_id),
+        user=user_id,
+    ).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты порциями подписчиков.
+
+    Нужна после массовой загрузки через bulk_create, которая не
+    отправляет сигналов. Для авторов порции из REBUILD_CHUNK
+    подписчиков FEED_MAX_LENGTH свежих постов читаются по индексу
+    (author, pub_date, id) с LIMIT, а лента подписчика - слияние этих
+    списков: ни join всех подписок со всеми постами, ни сортировки по
+    всей таблице.
+    """
+    cache.delete(HEAVY_AUTHORS_KEY)
+    heavy = heavy_authors()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FeedItem._meta.db_table}')
+    user_ids = list(Follow.objects.order_by('user')
+                    .values_list('user', flat=True).distinct())
+    for start in range(0, len(user_ids), REBUILD_CHUNK):
+        _rebuild_chunk(user_ids[start:start + REBUILD_CHUNK], heavy)
+
+
+def _newest_posts(author_id):
+    return list(Post.objects.filter(author=author_id)
+                .order_by('-pub_date', '-id')
+                .values_list('pub_date', 'id')[:settings.FEED_MAX_LENGTH])
+
+
+def _rebuild_chunk(user_ids, heavy):
+    following = defaultdict(list)
+    for user_id, author_id in (Follow.objects.filter(user__in=user_ids)
+                               .values_list('user', 'author')):
+        if author_id not in heavy:
+            following[user_id].append(author_id)
+    # список автора читается один раз на порцию, сколько бы у него
+    # ни было подписчиков в ней
+    newest = {author_id: _newest_posts(author_id)
+              for author_id in set(itertools.chain(*following.values()))}
+    with transaction.atomic():
+        for user_id, authors in following.items():
+            posts = heapq.merge(*(newest[author_id] for author_id in authors),
+                                reverse=True)
+            FeedItem.objects.bulk_create(
+                (FeedItem(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+                 for pub_date, post_id in itertools.islice(
+                     posts, settings.FEED_MAX_LENGTH)),
+                batch_size=500,
+            )
+
+
+def overflowing_users():
+    """Пользователи, чьи ленты выросли больше FEED_MAX_LENGTH."""
+    return (FeedItem.objects.values('user')
+            .annotate(items=Count('id'))
+            .filter(items__gt=settings.FEED_MAX_LENGTH)
+            .values_list('user', flat=True))
+
+
+def feed_posts(user):
+    """Посты для follow_index: материализованная лента + тяжёлые авторы.
+
+    Ключ сортировки ленты (feed_date, feed_post) берётся из FeedItem,
+    чтобы страница читалась по индексу (user, pub_date, post) без
+    сортировки; с подмешанными авторами это те же поля поста.
+    """
+    heavy = heavy_authors()
+    pulled = []
+    if heavy:
+        pulled = [author_id for author_id in
+                  Follow.objects.filter(user=user)
+                  .values_list('author', flat=True)
+                  if author_id in heavy]
+    if not pulled:
+        posts = Post.objects.filter(feed_items__user=user).annotate(
+            feed_date=F('feed_items__pub_date'),
+            feed_post=F('feed_items__post'))
+    else:
+        posts = Post.objects.filter(
+            Q(pk__in=FeedItem.objects.filter(user=user).values('post'))
+            | Q(author__in=pulled)
+        ).annotate(feed_date=F('pub_date'), feed_post=F('id'))
+    return posts.order_by('-feed_date', '-feed_post')
@@ -1,8 +1,24 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from . import images
 
 
 class PostForm(forms.ModelForm):
+    original_image = None
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            # новая загрузка: храним уменьшенную копию без EXIF
+            self.original_image = image
+            return images.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        if self.original_image is not None:
+            images.keep_original(self.original_image)
+        return super().save(commit)
 
     class Meta:
         model = Post
@@ -0,0 +1,144 @@
+"""Граф подписок: отсортированные массивы id в общем кеше.
+
+Для каждого пользователя храним два массива array('i'): на кого он
+подписан и кто подписан на него. Массив поднимается из posts_follow
+одним запросом по индексу и дальше правится сигналами Follow, так что
+«подписан ли A на B» - это бинарный поиск, а списки подписчиков и
+взаимные подписки не ходят в базу.
+
+Правка массива - чтение, изменение и запись; её защищает короткий
+замок в кеше. Если замок занят, массив просто удаляется и при
+следующем чтении поднимется из базы заново. Каждая правка увеличивает
+версию массива, и поднятый из базы массив кладётся в кеш под тем же
+замком, только если версия за время чтения не менялась: иначе чтение
+могло не увидеть правку. Массивы живут TIMEOUT (с LocMemCache - не
+дольше LOCAL_CACHE_TIMEOUT, как и страницы): это предел расхождения с
+базой, если правка разминулась с чтением или прошла в другом воркере.
+"""
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .caching import scoped_timeout
+from .models import Follow
+
+FOLLOWING, FOLLOWERS = 'following', 'followers'
+LOCK_TIMEOUT = 5
+TIMEOUT = 60 * 60
+
+
+def _key(direction, user_id):
+    return f'graph:{direction}:{user_id}'
+
+
+def _load(direction, user_id):
+    if direction == FOLLOWING:
+        ids = (Follow.objects.filter(user_id=user_id)
+               .order_by('author_id').values_list('author_id', flat=True))
+    else:
+        ids = (Follow.objects.filter(author_id=user_id)
+               .order_by('user_id').values_list('user_id', flat=True))
+    return array('i', ids)
+
+
+def _get(direction, user_id):
+    key = _key(direction, user_id)
+    raw = cache.get(key)
+    if raw is not None:
+        ids = array('i')
+        ids.frombytes(raw)
+        return ids
+    version = cache.get(key + ':version')
+    ids = _load(direction, user_id)
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            if cache.get(key + ':version') == version:
+                cache.add(key, ids.tobytes(), scoped_timeout(TIMEOUT))
+        finally:
+            cache.delete(lock_key)
+    return ids
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def following(user_id):
+    """Отсортированные id авторов, на которых подписан user_id."""
+    return _get(FOLLOWING, user_id)
+
+
+def followers(user_id):
+    """Отсортированные id подписчиков user_id."""
+    return _get(FOLLOWERS, user_id)
+
+
+def is_following(user_id, author_id):
+    if not user_id or user_id == author_id:
+        return False
+    return _contains(following(user_id), author_id)
+
+
+def following_count(user_id):
+    return len(following(user_id))
+
+
+def followers_count(user_id):
+    return len(followers(user_id))
+
+
+def mutual(user_id):
+    """id тех, с кем user_id подписан взаимно (слияние двух массивов)."""
+    left, right = following(user_id), followers(user_id)
+    result = array('i')
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] == right[j]:
+            result.append(left[i])
+            i += 1
+            j += 1
+        elif left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def _update(direction, user_id, other_id, add):
+    key = _key(direction, user_id)
+    try:
+        cache.incr(key + ':version')
+    except ValueError:
+        cache.add(key + ':version', 1, None)
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        cache.delete(key)
+        return
+    try:
+        raw = cache.get(key)
+        if raw is None:
+            # массива нет в кеше - поднимется из базы при чтении
+            return
+        ids = array('i')
+        ids.frombytes(raw)
+        present = _contains(ids, other_id)
+        if add and not present:
+            insort(ids, other_id)
+        elif not add and present:
+            ids.pop(bisect_left(ids, other_id))
+        cache.set(key, ids.tobytes(), scoped_timeout(TIMEOUT))
+    finally:
+        cache.delete(lock_key)
+
+
+def add_edge(user_id, author_id):
+    _update(FOLLOWING, user_id, author_id, add=True)
+    _update(FOLLOWERS, author_id, user_id, add=True)
+
+
+def remove_edge(user_id, author_id):
+    _update(FOLLOWING, user_id, author_id, add=False)
+    _update(FOLLOWERS, author_id, user_id, add=False)
@@ -0,0 +1,69 @@
+"""Нормализация картинок постов при загрузке.
+
+Исходник любого размера уменьшается до IMAGE_MAX_SIDE по большей
+стороне, поворачивается по EXIF и пересохраняется без метаданных в
+IMAGE_FORMAT. Дальше миниатюры строятся уже из компактного файла.
+JPEG декодируется сразу в уменьшенном масштабе (draft), а результат
+пишется во временный файл, который уходит на диск чанками, поэтому
+крупная загрузка не лежит в памяти целиком.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+ORIGINALS_DIR = 'posts/originals'
+# держим результат в памяти до этого размера, дальше - во временном файле
+SPOOL_SIZE = 1024 * 1024
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def output_format():
+    """IMAGE_FORMAT, если Pillow его умеет, иначе JPEG."""
+    fmt = settings.IMAGE_FORMAT.upper()
+    if fmt == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return fmt
+
+
+def _flatten(image):
+    # у JPEG нет прозрачности: кладём картинку на белый фон
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def normalize(upload):
+    """Возвращает File с уменьшенной картинкой без метаданных."""
+    max_side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # JPEG сразу декодируется в 1/2, 1/4 или 1/8 размера
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image = _flatten(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        fmt = output_format()
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        # exif и прочие метаданные не передаём - они не сохранятся
+        image.save(output, fmt, quality=settings.IMAGE_QUALITY,
+                   optimize=True, progressive=True)
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(output, name=f'{stem}.{EXTENSIONS[fmt]}')
+
+
+def keep_original(upload):
+    """Сохраняет исходник как есть, если это включено настройками."""
+    if not settings.IMAGE_KEEP_ORIGINAL:
+        return None
+    upload.seek(0)
+    name = os.path.join(ORIGINALS_DIR, os.path.basename(upload.name))
+    # storage.save пишет файл чанками из временного файла загрузки
+    return default_storage.save(name, upload)
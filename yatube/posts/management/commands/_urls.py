@@ -0,0 +1,49 @@
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post, UserStats
+from posts.urls import app_name, urlpatterns
+
+# эти адреса меняют данные или выгружают всё целиком, их не замеряем
+# и не проверяем
+SKIPPED = {'add_comment', 'profile_follow', 'profile_unfollow',
+           'export_author', 'export_group'}
+QUERY_PARAMS = {'search': {'q': 'пост'}}
+# править пост может только его автор, остальным - редирект
+AS_AUTHOR = {'edit_post'}
+
+
+def samples():
+    """Самые «тяжёлые» объекты: на них и видны проблемы."""
+    stats = (UserStats.objects.select_related('user')
+             .order_by('-following_count').first())
+    author = (UserStats.objects.select_related('user')
+              .order_by('-followers_count').first())
+    post = (Post.objects.order_by('-stats__comments_count', '-pk')
+            .select_related('author').first())
+    group = Group.objects.order_by('-pk').first()
+    if not (stats and author and post and group):
+        raise CommandError('База пуста: сначала запустите seed_data')
+    return {
+        'user': stats.user,
+        'author': post.author,
+        'username': author.user.username,
+        'post_id': post.pk,
+        'slug': group.slug,
+    }
+
+
+def login_as(name, values):
+    """Пользователь, под которым открывается адрес name."""
+    return values['author'] if name in AS_AUTHOR else values['user']
+
+
+def read_only_urls(values):
+    """(имя, адрес, GET-параметры) для каждого читающего адреса posts."""
+    for pattern in urlpatterns:
+        if pattern.name in SKIPPED:
+            continue
+        kwargs = {name: values[name] for name in pattern.pattern.converters}
+        yield (pattern.name,
+               reverse(f'{app_name}:{pattern.name}', kwargs=kwargs),
+               QUERY_PARAMS.get(pattern.name, {}))
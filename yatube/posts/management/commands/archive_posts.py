@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты старше ARCHIVE_AFTER_DAYS с комментариями '
+            'в архив пачками; прерванный запуск можно просто повторить')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='возраст поста в днях, по умолчанию '
+                                 'ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--batch', type=int, default=500,
+                            help='постов в одной транзакции')
+        parser.add_argument('--max-batches', type=int,
+                            help='остановиться после стольких пачек')
+
+    def handle(self, *args, **options):
+        if options['batch'] < 1:
+            raise CommandError('--batch должно быть больше нуля')
+        cutoff = archive.cutoff(options['days'])
+        started = time.perf_counter()
+        limit = options['max_batches']
+        done = batches = 0
+        while limit is None or batches < limit:
+            moved = archive.archive_batch(cutoff, options['batch'])
+            if not moved:
+                break
+            done += moved
+            batches += 1
+        self.stdout.write(f'В архив перенесено постов: {done} за '
+                          f'{time.perf_counter() - started:.1f} с')
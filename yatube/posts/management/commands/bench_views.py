@@ -0,0 +1,88 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.profiling import QueryCounter, on_all_databases
+
+from ._urls import login_as, read_only_urls, samples
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет адреса posts/urls.py через тестовый клиент: '
+            'p50/p95 времени ответа, число SQL-запросов и строк')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warm', action='store_true',
+                            help='не сбрасывать кеш между запросами')
+        parser.add_argument('--output', help='сохранить результаты в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        values = samples()
+        client = Client()
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        results = {}
+        for name, url, params in read_only_urls(values):
+            client.force_login(login_as(name, values))
+            results[name] = self.measure(client, url, params,
+                                         options['repeat'], options['warm'])
+
+        self.report(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def measure(self, client, url, params, repeat, warm):
+        timings = []
+        counter = QueryCounter()
+        status = None
+        for _ in range(repeat):
+            if not warm:
+                cache.clear()
+            with on_all_databases(counter):
+                started = time.perf_counter()
+                response = client.get(url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            status = response.status_code
+            if status != 200:
+                # редирект или ошибка замеряют не ту страницу
+                raise CommandError(f'{url}: код ответа {status}')
+        timings.sort()
+        return {
+            'url': url,
+            'status': status,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'queries': counter.queries / repeat,
+            'rows': counter.rows / repeat,
+            'sql_ms': round(counter.duration * 1000 / repeat, 2),
+        }
+
+    def report(self, results, baseline):
+        self.stdout.write(f'{"адрес":<16} {"код":>4} {"p50 мс":>9} '
+                          f'{"p95 мс":>9} {"запросы":>8} {"строки":>8}')
+        for name, result in results.items():
+            line = (f'{name:<16} {result["status"]:>4} '
+                    f'{result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                    f'{result["queries"]:>8.1f} {result["rows"]:>8.1f}')
+            previous = baseline.get(name)
+            if previous and previous['p50_ms']:
+                change = result['p50_ms'] / previous['p50_ms'] - 1
+                line += (f'  p50 {change:+.0%}, запросы '
+                         f'{result["queries"] - previous["queries"]:+.1f}')
+            self.stdout.write(line)
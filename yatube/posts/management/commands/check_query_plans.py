@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from core.profiling import QueryLog, on_all_databases
+from posts.search import FTS_TABLE
+
+from ._urls import login_as, read_only_urls, samples
+
+# выдача поиска сортируется по rank, который считается на лету;
+# временного B-дерева тут не избежать, зато строк в нём не больше LIMIT
+EXEMPT = (FTS_TABLE,)
+
+
+def bad_steps(sql, plan):
+    """Шаги плана с полным проходом таблицы или сортировкой на лету.
+
+    Запрос без WHERE (например, список групп для формы) и так читает
+    всю таблицу, проход по ней не считается ошибкой.
+    """
+    filtered = ' WHERE ' in sql
+    for *_, detail in plan:
+        if 'TEMP B-TREE' in detail:
+            yield detail
+        elif (filtered and detail.startswith('SCAN ')
+              and 'INDEX' not in detail and 'CONSTANT ROW' not in detail):
+            yield detail
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет EXPLAIN QUERY PLAN для запросов каждой читающей '
+            'страницы и падает, если план читает таблицу целиком или '
+            'сортирует во временном B-дереве')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживает только SQLite')
+        values = samples()
+        client = Client()
+        failures = 0
+        for name, url, params in read_only_urls(values):
+            client.force_login(login_as(name, values))
+            cache.clear()
+            log = QueryLog()
+            with on_all_databases(log):
+                client.get(url, params)
+            seen = set()
+            for sql, query_params in log.queries:
+                if (not sql.lstrip().upper().startswith('SELECT')
+                        or sql in seen
+                        or any(table in sql for table in EXEMPT)):
+                    continue
+                seen.add(sql)
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, query_params)
+                    steps = list(bad_steps(sql, cursor.fetchall()))
+                if steps:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f'{name}: {url}'))
+                    self.stdout.write(f'  {sql}')
+                    for step in steps:
+                        self.stdout.write(f'  -> {step}')
+            self.stdout.write(f'{name}: проверено запросов {len(seen)}')
+        if failures:
+            raise CommandError(f'Плохих планов: {failures}')
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы'))
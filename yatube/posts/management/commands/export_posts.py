@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import archive, export
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты или комментарии автора или группы '
+            '(с архивными) в NDJSON или CSV')
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='username автора')
+        source.add_argument('--group', help='slug группы')
+        parser.add_argument('--format', choices=list(export.FORMATS),
+                            default='ndjson')
+        parser.add_argument('--kind', choices=export.KINDS, default='posts')
+        parser.add_argument('--output', help='файл; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if options['author']:
+            posts = Post.objects.filter(author__username=options['author'])
+            author_id = (User.objects.filter(username=options['author'])
+                         .values_list('pk', flat=True).first())
+            archived = (archive.ArchivedPosts(author_id=author_id)
+                        if author_id else None)
+        else:
+            posts = Post.objects.filter(group__slug=options['group'])
+            group_id = (Group.objects.filter(slug=options['group'])
+                        .values_list('pk', flat=True).first())
+            archived = (archive.ArchivedPosts(group_id=group_id)
+                        if group_id else None)
+        lines = export.export(posts, options['kind'], options['format'],
+                              archived)
+        if not options['output']:
+            self.write(lines, self.stdout)
+            return
+        try:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as file:
+                count = self.write(lines, file)
+        except OSError as error:
+            raise CommandError(error)
+        self.stderr.write(f'Выгружено строк: {count}')
+
+    def write(self, lines, file):
+        count = 0
+        for count, line in enumerate(lines, 1):
+            file.write(line)
+        return count
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from posts import thumbnails
+from posts.models import Post
+
+CHUNK_SIZE = 500
+
+
+def _generate(name):
+    # у каждого потока пула своё соединение с базой: закрываем его,
+    # как thumbnails._run, иначе оно висит до конца команды
+    try:
+        thumbnails.generate(name)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для всех картинок постов, у которых их нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='1 - строить в текущем потоке')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers должно быть больше нуля')
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        run = pool.map if pool else map
+        # в текущем потоке соединение не закрываем: по нему идёт iterator()
+        generate = _generate if pool else thumbnails.generate
+        names = (Post.objects.exclude(image='')
+                 .values_list('image', flat=True).iterator())
+        done = 0
+        chunk = []
+        try:
+            for name in names:
+                if thumbnails.lookup(name, 'card') is None:
+                    chunk.append(name)
+                if len(chunk) == CHUNK_SIZE:
+                    done += len(list(run(generate, chunk)))
+                    chunk = []
+            done += len(list(run(generate, chunk)))
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(f'Построено миниатюр: {done}')
@@ -0,0 +1,316 @@
+import csv
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import after_bulk_load, explicit_dates
+from posts.export import KINDS
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+IMAGE_DIR = 'posts'
+
+
+def read_rows(path, fmt):
+    """Строки файла как словари; NDJSON и CSV читаются потоково."""
+    with open(path, encoding='utf-8', newline='') as file:
+        if fmt == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def reserve_ids(model, last_id):
+    """Сдвигает AUTOINCREMENT за last_id: сайт не займёт id импорта."""
+    if connection.vendor != 'sqlite':
+        return
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) '
+                       'WHERE name = %s', [last_id, table])
+        if cursor.rowcount == 0:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) '
+                           'VALUES (%s, %s)', [table, last_id])
+
+
+def write_json(path, data):
+    # запись через временный файл: сбой не оставит битый файл
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+def read_id_map(path):
+    """{id поста в выгрузке: новый id} из файла импорта постов."""
+    ids = {}
+    try:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    source, new = json.loads(line)
+                except (TypeError, ValueError):
+                    # строка, недописанная при сбое; пачку дописали заново
+                    continue
+                # ключи строками: в CSV и NDJSON id разного типа
+                ids[str(source)] = new
+    except OSError as error:
+        raise CommandError(f'Не читается {path}: {error}')
+    return ids
+
+
+def reset_sequences(*models):
+    """На прочих СУБД выравнивает последовательности после явных id."""
+    if connection.vendor == 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class Command(BaseCommand):
+    help = ('Массово загружает посты или комментарии из NDJSON/CSV '
+            '(формат export_posts) пачками bulk_create с контрольной '
+            'точкой для продолжения после сбоя')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['ndjson', 'csv'],
+                            help='по умолчанию - по расширению файла')
+        parser.add_argument('--kind', choices=KINDS, default='posts')
+        parser.add_argument('--batch', type=int, default=2000,
+                            help='строк в одной транзакции')
+        parser.add_argument('--media-source', default='.',
+                            help='откуда брать картинки из поля image')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='потоков копирования картинок')
+        parser.add_argument('--checkpoint',
+                            help='файл контрольной точки '
+                                 '(по умолчанию <path>.checkpoint)')
+        parser.add_argument('--id-map',
+                            help='соответствие id выгрузки новым id: '
+                                 'импорт постов дописывает его по пачкам '
+                                 '(по умолчанию <path>.ids), импорт '
+                                 'комментариев переводит через него поле '
+                                 'post; без него post - id поста в этой '
+                                 'базе')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        self.kind = options['kind']
+        self.model = Post if self.kind == 'posts' else Comment
+        self.media_source = options['media_source']
+        self.checkpoint_path = options['checkpoint'] or path + '.checkpoint'
+        state = self.load_checkpoint(path, fmt)
+        self.prepare_id_map(options['id_map'] or path + '.ids',
+                            fresh=state['done'] == 0,
+                            given=bool(options['id_map']))
+
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.skipped = 0
+        self.missing_images = 0
+        rows = read_rows(path, fmt)
+        # уже загруженные строки пропускаем; их id были
+        # id_base + номер строки, поэтому повтор пачки ничего не дублирует
+        rows = enumerate(itertools.islice(rows, state['done'], None),
+                         state['done'] + 1)
+        started = time.perf_counter()
+        imported = self.load_rows(rows, state, options)
+        self.finish(started, imported)
+
+    def prepare_id_map(self, id_map, fresh, given):
+        """Файл соответствия id: импорт постов дописывает, комментарии
+        читают."""
+        # пары (id в выгрузке, новый id) текущей пачки
+        self.ids = []
+        self.post_ids = None
+        self.id_map_path = id_map
+        if self.kind == 'comments':
+            if given:
+                self.post_ids = read_id_map(id_map)
+            return
+        if fresh or not os.path.exists(id_map):
+            open(id_map, 'w', encoding='utf-8').close()
+            return
+        with open(id_map, 'rb+') as file:
+            # строку, недописанную при сбое, закрываем: новые пары
+            # пойдут с новой строки
+            file.seek(0, os.SEEK_END)
+            if file.tell():
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    file.write(b'\n')
+
+    def load_rows(self, rows, state, options):
+        """Пишет строки пачками; сколько объектов загружено."""
+        started = time.perf_counter()
+        imported = 0
+        date_field = self.model._meta.get_field(
+            'pub_date' if self.kind == 'posts' else 'created')
+        with ThreadPoolExecutor(options['workers']) as pool, \
+                explicit_dates(date_field):
+            while True:
+                chunk = list(itertools.islice(rows, options['batch']))
+                if not chunk:
+                    break
+                objects = self.build(chunk, state['id_base'], pool)
+                with transaction.atomic():
+                    self.model.objects.bulk_create(objects,
+                                                   ignore_conflicts=True)
+                # пары id дописываются до сохранения точки: повтор
+                # пачки после сбоя лишь допишет те же пары ещё раз
+                self.save_ids()
+                state['done'] = chunk[-1][0]
+                self.save_checkpoint(state)
+                imported += len(objects)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'строк: {state["done"]}, '
+                                  f'{imported / elapsed:.0f} строк/с')
+        return imported
+
+    def finish(self, started, imported):
+        """Досчитывает производные данные и печатает итог."""
+        reset_sequences(self.model)
+        for title, func in after_bulk_load():
+            step_started = time.perf_counter()
+            func()
+            self.stdout.write(
+                f'{title}: {time.perf_counter() - step_started:.1f} с')
+        os.remove(self.checkpoint_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {imported} за {elapsed:.1f} с '
+            f'({imported / max(elapsed, 1e-9):.0f} строк/с), '
+            f'пропущено {self.skipped}, '
+            f'без картинки {self.missing_images}'))
+        if self.kind == 'posts':
+            self.stdout.write(f'Комментарии: manage.py import_posts <файл> '
+                              f'--kind=comments --id-map={self.id_map_path}')
+            self.stdout.write('Миниатюры: manage.py generate_thumbnails')
+
+    def load_checkpoint(self, path, fmt):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as file:
+                state = json.load(file)
+            self.stdout.write(f'Продолжаем со строки {state["done"] + 1}')
+            return state
+        total = sum(1 for _ in read_rows(path, fmt))
+        id_base = self.model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        reserve_ids(self.model, id_base + total)
+        state = {'id_base': id_base, 'done': 0}
+        self.save_checkpoint(state)
+        return state
+
+    def save_checkpoint(self, state):
+        write_json(self.checkpoint_path, state)
+
+    def save_ids(self):
+        if not self.ids:
+            return
+        with open(self.id_map_path, 'a', encoding='utf-8') as file:
+            file.writelines(json.dumps(pair) + '\n' for pair in self.ids)
+        self.ids = []
+
+    def build(self, chunk, id_base, pool):
+        if self.kind == 'comments':
+            return self.build_comments(chunk, id_base)
+        return self.build_posts(chunk, id_base, pool)
+
+    def parse_date(self, value):
+        date = parse_datetime(value) if value else None
+        if date is None:
+            return timezone.now()
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def build_posts(self, chunk, id_base, pool):
+        posts = []
+        copies = []
+        for number, row in chunk:
+            author_id = self.authors.get(row.get('author'))
+            if author_id is None:
+                self.skipped += 1
+                continue
+            post = Post(id=id_base + number,
+                        author_id=author_id,
+                        group_id=self.groups.get(row.get('group')),
+                        text=row.get('text', ''),
+                        pub_date=self.parse_date(row.get('pub_date')))
+            if row.get('image'):
+                copies.append((post, row['image']))
+            if row.get('id') not in (None, ''):
+                self.ids.append((row['id'], post.id))
+            posts.append(post)
+        # картинки копируем до записи пачки: в базу не попадёт
+        # ссылка на файл, которого нет
+        for (post, _), name in zip(copies, pool.map(self.copy_image,
+                                                    copies)):
+            post.image = name
+            if not name:
+                self.missing_images += 1
+        return posts
+
+    def copy_image(self, item):
+        post, source = item
+        source = os.path.join(self.media_source, source)
+        if not os.path.isfile(source):
+            return ''
+        # имя зависит от id поста: повторный импорт не плодит копий
+        name = f'{IMAGE_DIR}/{post.id}_{os.path.basename(source)}'
+        target = os.path.join(settings.MEDIA_ROOT, name)
+        if (not os.path.exists(target)
+                or os.path.getsize(target) != os.path.getsize(source)):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+        return name
+
+    def resolve_post(self, value):
+        """id поста в этой базе для поля post строки комментария."""
+        if self.post_ids is not None:
+            return self.post_ids.get(str(value))
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def build_comments(self, chunk, id_base):
+        post_ids = {number: self.resolve_post(row.get('post'))
+                    for number, row in chunk}
+        wanted = set(post_ids.values()) - {None}
+        existing = set(Post.objects.filter(pk__in=wanted)
+                       .values_list('pk', flat=True))
+        comments = []
+        for number, row in chunk:
+            author_id = self.authors.get(row.get('author'))
+            post_id = post_ids[number]
+            if author_id is None or post_id not in existing:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                id=id_base + number,
+                author_id=author_id,
+                post_id=post_id,
+                text=row.get('text', ''),
+                created=self.parse_date(row.get('created'))))
+        return comments
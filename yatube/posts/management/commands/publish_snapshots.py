@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import snapshots
+
+
+class Command(BaseCommand):
+    help = ('Заново выкладывает статические снимки горячих страниц для '
+            'анонимов; запускать после деплоя и массовых правок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int,
+                            default=settings.SNAPSHOTS_LIMIT,
+                            help='сколько профилей и постов выложить')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        published, total = snapshots.publish_all(options['limit'])
+        self.stdout.write(f'Снимков: {published} из {total} адресов за '
+                          f'{time.perf_counter() - started:.1f} с')
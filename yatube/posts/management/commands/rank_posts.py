@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки обсуждаемости всех постов пачками; '
+            'запускать по расписанию и после миграции 0014')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000,
+                            help='постов в одной транзакции')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done = ranking.rescore(batch=options['batch'])
+        self.stdout.write(f'Пересчитано постов: {done} за '
+                          f'{time.perf_counter() - started:.1f} с')
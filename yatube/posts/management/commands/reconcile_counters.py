@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики постов, подписок и комментариев с таблицами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только показать число расхождений')
+
+    def handle(self, *args, **options):
+        drifted = counters.reconcile(fix=not options['dry_run'])
+        action = 'найдено' if options['dry_run'] else 'исправлено'
+        self.stdout.write(f'Расхождений {action}: {drifted}')
@@ -0,0 +1,169 @@
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts.bulk import after_bulk_load, explicit_dates
+from posts.models import Comment, Follow, Group, Post, User
+
+TEXT_POOL_SIZE = 5000
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса: k-й по популярности выбирается как 1 / k**alpha."""
+    return list(itertools.accumulate(1 / (rank ** alpha)
+                                     for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу тестовыми пользователями, группами, постами, '
+            'подписками и комментариями для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='среднее число подписок на пользователя')
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='показатель степенного закона '
+                                 'популярности авторов')
+        parser.add_argument('--days', type=int, default=365,
+                            help='за сколько дней разбросать даты')
+        parser.add_argument('--batch', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        Faker.seed(options['seed'])
+        self.batch = options['batch']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days']).total_seconds()
+        started = time.perf_counter()
+
+        users = self.step('пользователи', self.create_users,
+                          options['users'])
+        groups = self.step('группы', self.create_groups, options['groups'])
+        # популярность авторов по степенному закону: немногие
+        # пишут и собирают подписчиков больше всех остальных
+        popular = users[:]
+        self.rng.shuffle(popular)
+        weights = power_law_weights(len(popular), options['alpha'])
+        posts = self.step('посты', self.create_posts, options['posts'],
+                          popular, weights, groups)
+        self.step('подписки', self.create_follows, users, popular, weights,
+                  options['follows'])
+        self.step('комментарии', self.create_comments, options['comments'],
+                  users, posts)
+        for title, func in after_bulk_load():
+            self.step(title, func)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'))
+
+    def step(self, title, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.stdout.write(f'{title}: {time.perf_counter() - started:.1f} с')
+        return result
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.random() * self.span)
+
+    def texts(self):
+        pool = [self.faker.text(max_nb_chars=300)
+                for _ in range(TEXT_POOL_SIZE)]
+        while True:
+            yield self.rng.choice(pool)
+
+    def insert(self, model, objects):
+        for chunk in iter(lambda: list(itertools.islice(objects,
+                                                        self.batch)), []):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def new_ids(self, model, before):
+        return list(model.objects.filter(pk__gt=before)
+                    .order_by('pk').values_list('pk', flat=True))
+
+    def last_id(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_users(self, count):
+        before = self.last_id(User)
+        password = make_password(None)
+        self.insert(User, (
+            User(username=f'seed{before + n}',
+                 first_name=self.faker.first_name(),
+                 last_name=self.faker.last_name(),
+                 password=password)
+            for n in range(count)
+        ))
+        return self.new_ids(User, before)
+
+    def create_groups(self, count):
+        before = self.last_id(Group)
+        self.insert(Group, (
+            Group(title=self.faker.catch_phrase()[:200],
+                  slug=f'seed-{before + n}',
+                  description=self.faker.paragraph())
+            for n in range(count)
+        ))
+        return self.new_ids(Group, before)
+
+    def create_posts(self, count, authors, weights, groups):
+        before = self.last_id(Post)
+        texts = self.texts()
+        chosen = self.rng.choices(authors, cum_weights=weights, k=count)
+        fields = [Post._meta.get_field('pub_date')]
+        with explicit_dates(*fields):
+            self.insert(Post, (
+                Post(author_id=author_id,
+                     group_id=(self.rng.choice(groups)
+                               if groups and self.rng.random() < 0.7
+                               else None),
+                     text=next(texts),
+                     pub_date=self.random_date())
+                for author_id in chosen
+            ))
+        return self.new_ids(Post, before)
+
+    def create_follows(self, users, authors, weights, average):
+        def follows():
+            for user_id in users:
+                # число подписок тоже с тяжёлым хвостом
+                count = min(int(self.rng.paretovariate(1.5) * average / 3),
+                            len(authors) - 1)
+                targets = set(self.rng.choices(authors, cum_weights=weights,
+                                               k=count))
+                targets.discard(user_id)
+                for author_id in targets:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        self.insert(Follow, follows())
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        texts = self.texts()
+        # обсуждают в основном свежие и популярные посты
+        weights = power_law_weights(len(posts), 0.8)
+        recent_first = posts[::-1]
+        fields = [Comment._meta.get_field('created')]
+        with explicit_dates(*fields):
+            self.insert(Comment, (
+                Comment(author_id=self.rng.choice(users),
+                        post_id=post_id,
+                        text=next(texts)[:200],
+                        created=self.random_date())
+                for post_id in self.rng.choices(recent_first,
+                                                cum_weights=weights,
+                                                k=count)
+            ))
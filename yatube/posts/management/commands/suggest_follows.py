@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «кого почитать» по графу '
+            'подписок; запускать по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500,
+                            help='пользователей в одной транзакции')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = suggestions.rebuild(batch=options['batch'])
+        self.stdout.write(f'Рекомендации для {users} пользователей за '
+                          f'{time.perf_counter() - started:.1f} с')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Обрезает ленты подписок до FEED_MAX_LENGTH записей'
+
+    def handle(self, *args, **options):
+        trimmed = 0
+        for user_id in list(feed.overflowing_users()):
+            feed.trim(user_id)
+            trimmed += 1
+        self.stdout.write(f'Обрезано лент: {trimmed}')
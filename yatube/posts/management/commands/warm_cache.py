@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import warmup
+
+
+class Command(BaseCommand):
+    help = ('Заполняет кеш самыми посещаемыми страницами; запускать '
+            'после деплоя до того, как инстанс начнёт принимать трафик')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int,
+                            default=settings.CACHE_WARM_LIMIT,
+                            help='сколько групп, профилей и постов греть')
+        parser.add_argument('--workers', type=int,
+                            default=settings.CACHE_WARM_WORKERS,
+                            help='1 - рендерить в текущем потоке')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть больше нуля')
+        if not warmup.is_useful():
+            self.stderr.write(warmup.LOCAL_CACHE_WARNING)
+            return
+        urls = warmup.hot_urls(options['limit'])
+        report = warmup.warm(urls, options['workers'])
+        self.stdout.write(warmup.describe(report))
@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-17 15:45
+
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    """Каждому подписчику - только FEED_MAX_LENGTH свежих постов."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    db_alias = schema_editor.connection.alias
+    cap = settings.FEED_MAX_LENGTH
+    follows = (Follow.objects.using(db_alias).order_by('user')
+               .values_list('user', 'author'))
+    for user_id, pairs in itertools.groupby(follows.iterator(),
+                                            key=lambda pair: pair[0]):
+        newest = [
+            Post.objects.using(db_alias).filter(author=author_id)
+            .order_by('-pub_date', '-id')
+            .values_list('pub_date', 'id')[:cap]
+            for _, author_id in pairs]
+        posts = itertools.islice(heapq.merge(*newest, reverse=True), cap)
+        FeedItem.objects.using(db_alias).bulk_create(
+            (FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+             for pub_date, post_id in posts),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddField(
+            model_name='feeditem',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='feeditem',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'pub_date'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
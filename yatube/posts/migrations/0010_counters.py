@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-17 15:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostStats',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Post')),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
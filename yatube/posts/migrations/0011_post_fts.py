@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+        "text, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE} (rowid, text) '
+        'SELECT id, text FROM posts_post'
+    )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-17 16:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('score', models.FloatField()),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['score', 'post'], name='score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postscore',
+            index=models.Index(fields=['group', 'score', 'post'], name='score_group_idx'),
+        ),
+    ]
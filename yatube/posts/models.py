@@ -13,9 +13,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Посты для лент: автор и группа приезжают тем же запросом."""
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
+    # версия поста для кеша карточек
+    updated = models.DateTimeField(auto_now=True)
     group = models.ForeignKey(
         Group,
         blank=True,
@@ -34,11 +42,23 @@ class Post(models.Model):
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        # ленты фильтруют по одному полю и сортируют по (pub_date, id):
+        # с такими индексами страница читается по индексу без сортировки
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -56,6 +76,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -71,3 +95,102 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow')
         ]
+        # (user, author) покрыт unique_follow, а подписчиков ищут по автору
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class FeedItem(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост)."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_items')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='feed_items')
+    # копия post.pub_date, чтобы обрезать ленту без join
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_item')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляются сигналами при записи."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count} постов'
+
+
+class PostStats(models.Model):
+    """Счётчики поста, обновляются сигналами при записи."""
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    comments_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.post_id}: {self.comments_count} комментариев'
+
+
+class PostScore(models.Model):
+    """Оценка обсуждаемости поста (posts.ranking)."""
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='score')
+    # копия post.group_id: топ группы читается по индексу без join
+    group = models.ForeignKey(Group,
+                              blank=True,
+                              null=True,
+                              on_delete=models.SET_NULL,
+                              related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score', 'post'],
+                         name='score_idx'),
+            models.Index(fields=['group', 'score', 'post'],
+                         name='score_group_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
+
+
+class FollowSuggestion(models.Model):
+    """Кого почитать: top-K авторов на пользователя (posts.suggestions)."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='suggestions')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'score'],
+                         name='suggestion_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}: {self.score:.2f}'
@@ -0,0 +1,116 @@
+"""Рейтинг обсуждаемых постов.
+
+Вклад комментария затухает экспоненциально с периодом полураспада
+TRENDING_HALF_LIFE. Вместо того чтобы каждый раз уменьшать все оценки,
+храним логарифм суммы exp(rate * (t - EPOCH)) по посту и его
+комментариям: общее затухание одинаково для всех постов и порядок не
+меняет. Поэтому новый комментарий лишь добавляет одно слагаемое к своей
+строке, а top-N читается по индексу (score, post) срезом LIMIT N.
+Полный пересчёт (rank_posts) поправляет дрейф после удалений и
+массовой загрузки.
+"""
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .models import Comment, Post, PostScore
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def _rate():
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def term(moment, weight=1):
+    """Логарифм вклада события в момент moment."""
+    return _rate() * (moment - EPOCH).total_seconds() + math.log(weight)
+
+
+def logaddexp(first, second):
+    """log(exp(first) + exp(second)) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def score(pub_date, comment_dates):
+    result = term(pub_date, settings.TRENDING_POST_WEIGHT)
+    for created in comment_dates:
+        result = logaddexp(result, term(created))
+    return result
+
+
+def add_post(post):
+    PostScore.objects.create(
+        post=post, group_id=post.group_id,
+        score=term(post.pub_date, settings.TRENDING_POST_WEIGHT))
+    caching.bump('trending')
+
+
+def move_post(post):
+    PostScore.objects.filter(pk=post.pk).update(group_id=post.group_id)
+    caching.bump('trending')
+
+
+def remove_post(post_id):
+    PostScore.objects.filter(pk=post_id).delete()
+    caching.bump('trending')
+
+
+def add_comment(comment):
+    with transaction.atomic():
+        row = (PostScore.objects.select_for_update()
+               .filter(pk=comment.post_id).first())
+        if row is None:
+            rescore(Post.objects.filter(pk=comment.post_id))
+        else:
+            row.score = logaddexp(row.score, term(comment.created))
+            row.save(update_fields=['score'])
+    caching.bump('trending')
+
+
+def _comment_dates(post_ids):
+    dates = {}
+    comments = (Comment.objects.filter(post_id__in=post_ids)
+                .values_list('post_id', 'created'))
+    for post_id, created in comments.iterator():
+        dates.setdefault(post_id, []).append(created)
+    return dates
+
+
+def rescore(posts=None, batch=1000):
+    """Пересчитывает оценки пачками по batch постов; число постов."""
+    posts = (Post.objects.all() if posts is None else posts).order_by('pk')
+    done = 0
+    last_pk = 0
+    while True:
+        chunk = list(posts.filter(pk__gt=last_pk)
+                     .values_list('pk', 'pub_date', 'group_id')[:batch])
+        if not chunk:
+            break
+        post_ids = [pk for pk, _, _ in chunk]
+        dates = _comment_dates(post_ids)
+        with transaction.atomic():
+            PostScore.objects.filter(pk__in=post_ids).delete()
+            PostScore.objects.bulk_create(
+                PostScore(post_id=pk, group_id=group_id,
+                          score=score(pub_date, dates.get(pk, ())))
+                for pk, pub_date, group_id in chunk)
+        done += len(chunk)
+        last_pk = post_ids[-1]
+    caching.bump('trending')
+    return done
+
+
+def top(group=None, limit=None):
+    """Самые обсуждаемые посты, всей ленты или одной группы."""
+    scores = PostScore.objects.filter(group=group) if group else (
+        PostScore.objects.all())
+    post_ids = list(scores.order_by('-score', '-post_id')
+                    .values_list('post', flat=True)
+                    [:limit or settings.TRENDING_SIZE])
+    posts = Post.objects.for_listing().in_bulk(post_ids)
+    return [posts[pk] for pk in post_ids if pk in posts]
@@ -0,0 +1,143 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Теневая таблица posts_post_fts хранит текст поста под rowid = id поста
+и обновляется сигналами Post. Запрос идёт по инвертированному индексу
+FTS5 с ранжированием bm25, поэтому поиск не сканирует posts_post.
+На других СУБД поиск откатывается к icontains.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# предел, до которого считаем совпадения для пагинации
+MAX_RESULTS = 1000
+SNIPPET_TOKENS = 16
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post.pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                       'VALUES (%s, %s)', [post.pk, post.text])
+
+
+def unindex_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def rebuild_index():
+    """Перестраивает индекс целиком, например после bulk_create."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                       'SELECT id, text FROM posts_post')
+
+
+def build_match(query):
+    """Превращает ввод пользователя в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки (никакого синтаксиса FTS5 от
+    пользователя), последнее ищется по префиксу.
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet)
+                     .replace(MARK_OPEN, '<mark>')
+                     .replace(MARK_CLOSE, '</mark>'))
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator: count() и срезы."""
+
+    def __init__(self, query):
+        self.match = build_match(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                [self.match, MAX_RESULTS])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def ids(self, limit, offset=0):
+        return [post_id for post_id, _ in self._rows(limit, offset)]
+
+    def _rows(self, limit, offset):
+        if not self.match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [MARK_OPEN, MARK_CLOSE, '…', SNIPPET_TOKENS,
+                 self.match, limit, offset])
+            return cursor.fetchall()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        offset = index.start or 0
+        rows = self._rows(index.stop - offset, offset)
+        posts = Post.objects.for_listing().in_bulk(
+            [post_id for post_id, _ in rows])
+        results = []
+        for post_id, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+
+def search(query):
+    """Выдача по запросу: ранжированная FTS5 или icontains на других СУБД."""
+    if is_supported():
+        return SearchResults(query)
+    return Post.objects.for_listing().filter(text__icontains=query)
+
+
+def is_capped(results, count):
+    """Счёт FTS5 обрезан на MAX_RESULTS: совпадений может быть больше."""
+    return isinstance(results, SearchResults) and count >= MAX_RESULTS
+
+
+def search_ids(query, limit=MAX_RESULTS):
+    if is_supported():
+        return SearchResults(query).ids(limit)
+    return list(Post.objects.filter(text__icontains=query)
+                .values_list('id', flat=True)[:limit])
@@ -0,0 +1,158 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (caching, counters, feed, graph, ranking, search, suggestions,
+               thumbnails)
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        graph.add_edge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def drop_follow_suggestion(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        suggestions.drop(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    graph.remove_edge(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def score_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ranking.add_post(instance)
+    elif (getattr(instance, '_previous_group_id', None)
+          != instance.group_id):
+        ranking.move_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unscore_post(sender, instance, **kwargs):
+    ranking.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ranking.add_comment(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    # при переносе поста в другую группу устаревают обе ленты групп
+    instance._previous_group_id = None
+    if instance.pk and not raw:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    group_ids = {instance.group_id,
+                 getattr(instance, '_previous_group_id', None)} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list('slug',
+                                                               flat=True)
+    # правка текста или картинки видна и в обсуждаемом
+    caching.bump('index', 'trending',
+                 f'post:{instance.pk}',
+                 f'user:{instance.author.username}',
+                 *(f'group:{slug}' for slug in slugs))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    caching.bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    usernames = User.objects.filter(
+        pk__in=[instance.user_id, instance.author_id]
+    ).values_list('username', flat=True)
+    caching.bump(*(f'user:{username}' for username in usernames))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    caching.bump('index', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.schedule(instance.image.name)
@@ -0,0 +1,297 @@
+"""Готовые HTML-снимки страниц для анонимных посетителей.
+
+Главная, ленты групп, профили и страницы постов без параметров запроса
+рендерятся для анонима и кладутся в SNAPSHOTS_ROOT как
+<путь>/index.html (и рядом index.html.gz). Публикация идёт от того же
+caching.bump, что меняет поколения страниц: после коммита области
+уходят в фоновый поток, который перерисовывает их адреса, а страницы
+удалённых объектов стирает.
+
+Отдаёт снимки веб-сервер (try_files на SNAPSHOTS_ROOT для запросов без
+cookie сессии) или SnapshotApp - обёртка над WSGI-приложением, которая
+не трогает ни базу, ни шаблоны. Заголовки безопасности, которые
+поставили SecurityMiddleware и XFrameOptionsMiddleware, сохраняются
+рядом со снимком (index.html.headers) и отдаются вместе с ним.
+Опубликованные страницы постов каждого автора перечислены в его списке
+(.authors/<md5 username>.json): новый пост или подписка перерисовывают
+только их, не перебирая все посты автора.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import get_path_info
+from django.db import close_old_connections, transaction
+from django.http.cookie import parse_cookie
+from django.test import RequestFactory
+from django.urls import Resolver404, resolve, reverse
+
+from .models import Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.html'
+MANIFEST_DIR = '.authors'
+CONTENT_TYPE = 'text/html; charset=utf-8'
+SECURITY_HEADERS = (
+    'X-Frame-Options', 'X-Content-Type-Options', 'X-XSS-Protection',
+    'Referrer-Policy', 'Strict-Transport-Security',
+    'Content-Security-Policy', 'Cross-Origin-Opener-Policy',
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_handler = None
+
+
+def _file_path(path):
+    parts = [part for part in path.split('/') if part]
+    if any(part in ('.', '..') for part in parts):
+        return None
+    return os.path.join(settings.SNAPSHOTS_ROOT, *parts, INDEX_FILE)
+
+
+def _write(path, content):
+    # сначала во временный файл: сервер не увидит недописанную страницу
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f'{path}.{threading.get_ident()}.tmp'
+    with open(temp, 'wb') as file:
+        file.write(content)
+    os.replace(temp, path)
+
+
+def _remove(path):
+    for name in (path, path + '.gz', path + '.headers'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def _manifest_path(username):
+    name = hashlib.md5(username.encode()).hexdigest() + '.json'
+    return os.path.join(settings.SNAPSHOTS_ROOT, MANIFEST_DIR, name)
+
+
+def published_posts(username):
+    """id постов автора, чьи снимки выложены."""
+    try:
+        with open(_manifest_path(username), encoding='utf-8') as file:
+            return set(json.load(file))
+    except (FileNotFoundError, ValueError):
+        return set()
+
+
+def _record(url, published):
+    """Отмечает снимок страницы поста в списке его автора."""
+    try:
+        match = resolve(url)
+    except Resolver404:
+        return
+    if match.view_name != 'posts:post_detail':
+        return
+    post_id = match.kwargs['post_id']
+    username = (Post.objects.filter(pk=post_id)
+                .values_list('author__username', flat=True).first())
+    if username is None:
+        # пост удалён: из списка его уберёт следующий urls_for
+        return
+    ids = published_posts(username)
+    if (post_id in ids) == published:
+        return
+    if published:
+        ids.add(post_id)
+    else:
+        ids.discard(post_id)
+    _write(_manifest_path(username), json.dumps(sorted(ids)).encode())
+
+
+def _get_handler():
+    global _handler
+    if _handler is None:
+        handler = BaseHandler()
+        handler.load_middleware()
+        _handler = handler
+    return _handler
+
+
+def render(url):
+    """Ответ на анонимный GET url через весь стек middleware."""
+    request = RequestFactory().get(url, HTTP_HOST=settings.SNAPSHOTS_HOST)
+    return _get_handler().get_response(request)
+
+
+def publish(url):
+    """Перерисовывает снимок url; True, если снимок лежит на диске."""
+    path = _file_path(unquote(url))
+    response = render(url)
+    # формы с CSRF-токеном и ответы с cookie привязаны к посетителю
+    if (response.status_code != 200 or response.streaming
+            or response.cookies
+            or response.get('Content-Type') != CONTENT_TYPE):
+        _remove(path)
+        _record(url, published=False)
+        return False
+    headers = [(name, response[name]) for name in SECURITY_HEADERS
+               if response.has_header(name)]
+    # заголовки раньше страницы: снимок без них SnapshotApp не отдаст
+    _write(path + '.headers', json.dumps(headers).encode())
+    _write(path, response.content)
+    if settings.SNAPSHOTS_GZIP:
+        _write(path + '.gz', gzip.compress(response.content))
+    _record(url, published=True)
+    return True
+
+
+def is_published(url):
+    return os.path.exists(_file_path(unquote(url)))
+
+
+def urls_for(scope):
+    """Адреса снимков, которые зависят от области кеша scope."""
+    kind, _, value = scope.partition(':')
+    if kind == 'index':
+        return [reverse('posts:index')]
+    if kind == 'group':
+        return [reverse('posts:group_posts', kwargs={'slug': value})]
+    if kind == 'post':
+        return [reverse('posts:post_detail', kwargs={'post_id': value})]
+    if kind == 'user':
+        # на странице поста есть число постов автора; перерисовываем
+        # только уже опубликованные, остальные подождут publish_snapshots.
+        # Запрос - по id из списка автора, а не по всем его постам;
+        # снимки удалённых постов стирает их собственная область post:
+        listed = published_posts(value)
+        post_ids = list(Post.objects.filter(pk__in=listed,
+                                            author__username=value)
+                        .order_by('pk').values_list('pk', flat=True))
+        if len(post_ids) < len(listed):
+            _write(_manifest_path(value), json.dumps(post_ids).encode())
+        return ([reverse('posts:profile', kwargs={'username': value})]
+                + [reverse('posts:post_detail', kwargs={'post_id': post_id})
+                   for post_id in post_ids])
+    return []
+
+
+def refresh(scopes):
+    """Перерисовывает снимки всех адресов областей scopes."""
+    urls = dict.fromkeys(url for scope in scopes for url in urls_for(scope))
+    for url in urls:
+        publish(url)
+    return len(urls)
+
+
+def hot_urls(limit):
+    """Главная, все группы, limit самых читаемых авторов и свежих постов."""
+    yield reverse('posts:index')
+    for slug in Group.objects.values_list('slug', flat=True).iterator():
+        yield reverse('posts:group_posts', kwargs={'slug': slug})
+    for username in (User.objects.order_by('-stats__followers_count')
+                     .values_list('username', flat=True)[:limit]):
+        yield reverse('posts:profile', kwargs={'username': username})
+    for post_id in (Post.objects.order_by('-pub_date', '-pk')
+                    .values_list('pk', flat=True)[:limit]):
+        yield reverse('posts:post_detail', kwargs={'post_id': post_id})
+
+
+def publish_all(limit):
+    """Выкладывает снимки заново; (опубликовано, всего адресов)."""
+    # пока каталог пуст, запросы просто проходят в Django
+    shutil.rmtree(settings.SNAPSHOTS_ROOT, ignore_errors=True)
+    published = total = 0
+    for url in hot_urls(limit):
+        total += 1
+        published += publish(url)
+    return published, total
+
+
+def _run(scope):
+    try:
+        refresh([scope])
+    except Exception:
+        logger.exception('Не удалось обновить снимки области %s', scope)
+    finally:
+        _pending.discard(scope)
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # один поток: снимки одной страницы пишутся по порядку
+            _executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='snapshots')
+        return _executor
+
+
+def _submit(scope):
+    if scope in _pending:
+        return
+    _pending.add(scope)
+    _get_executor().submit(_run, scope)
+
+
+def schedule(scopes):
+    """Ставит области в очередь после коммита текущей транзакции."""
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    scopes = list(scopes)
+    transaction.on_commit(lambda: [_submit(scope) for scope in scopes])
+
+
+class SnapshotApp:
+    """WSGI-обёртка: анонимные GET без параметров отдаются с диска."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        path = self._snapshot_for(environ)
+        if path is None:
+            return self.application(environ, start_response)
+        try:
+            with open(path + '.headers', encoding='utf-8') as file:
+                headers = [tuple(header) for header in json.load(file)]
+            headers += [('Content-Type', CONTENT_TYPE),
+                        ('Vary', 'Accept-Encoding, Cookie')]
+            if ('gzip' in environ.get('HTTP_ACCEPT_ENCODING', '')
+                    and os.path.exists(path + '.gz')):
+                path += '.gz'
+                headers.append(('Content-Encoding', 'gzip'))
+            with open(path, 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            # снимок стёрли между проверкой и чтением или он выложен
+            # до сохранения заголовков - отвечает Django
+            return self.application(environ, start_response)
+        headers.append(('Content-Length', str(len(content))))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return [b'']
+        return [content]
+
+    def _snapshot_for(self, environ):
+        if (environ['REQUEST_METHOD'] not in ('GET', 'HEAD')
+                or environ.get('QUERY_STRING')):
+            return None
+        cookies = parse_cookie(environ.get('HTTP_COOKIE', ''))
+        if settings.SESSION_COOKIE_NAME in cookies:
+            return None
+        path_info = get_path_info(environ)
+        if not path_info.endswith('/'):
+            # адрес без слеша Django перенаправит сам
+            return None
+        path = _file_path(path_info)
+        if path is None or not os.path.exists(path):
+            return None
+        return path
@@ -0,0 +1,47 @@
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post):
+    # post.updated меняется при каждом сохранении поста, в том числе
+    # через post_edit, так что старая карточка просто перестаёт читаться.
+    # Имя и username автора и slug группы тоже есть в карточке: их
+    # правка меняет ключ так же (автор и группа уже загружены)
+    author = post.author
+    shown = '|'.join([author.username, author.get_full_name(),
+                      post.group.slug if post.group else ''])
+    return (f'post-card:{post.pk}:{post.updated.timestamp()}:'
+            + hashlib.md5(shown.encode()).hexdigest())
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы из кеша, одним get_many на страницу."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            # карточку с заглушкой вместо миниатюры не запоминаем
+            ready = thumbnails.is_ready(post.image)
+            card = render_to_string(CARD_TEMPLATE, {'post': post})
+            if ready:
+                rendered[key] = card
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe('<hr>'.join(cards))
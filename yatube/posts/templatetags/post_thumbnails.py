@@ -0,0 +1,16 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, alias='card'):
+    """Готовая миниатюра или None; при промахе картинка уходит в очередь."""
+    if not image:
+        return None
+    thumbnail = thumbnails.lookup(image, alias)
+    if thumbnail is None:
+        thumbnails.schedule(image.name)
+    return thumbnail
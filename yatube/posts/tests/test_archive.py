@@ -0,0 +1,148 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive, counters
+from ..models import Comment, Group, Post, UserStats
+from ..utils import encode_cursor
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+NUM_OF_POSTS = 12
+NUM_OF_OLD = 5
+
+
+@override_settings(ARCHIVE_PATH=os.path.join(TEMP_DIR, 'archive.sqlite3'))
+class ArchiveTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        archive._local.__dict__.clear()
+        for name in os.listdir(TEMP_DIR):
+            os.remove(os.path.join(TEMP_DIR, name))
+        os.rmdir(TEMP_DIR)
+
+    def setUp(self):
+        cache.clear()
+        if os.path.exists(settings.ARCHIVE_PATH):
+            archive._connection().execute('DELETE FROM archived_post')
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        now = timezone.now()
+        self.posts = []
+        for i in range(NUM_OF_POSTS):
+            post = Post.objects.create(author=self.user, group=self.group,
+                                       text=f'Пост {i}')
+            # первые NUM_OF_OLD постов на год старше остальных
+            age = timedelta(days=400 if i < NUM_OF_OLD else 1, minutes=-i)
+            Post.objects.filter(pk=post.pk).update(pub_date=now - age)
+            self.posts.append(post)
+        self.old = self.posts[0]
+        Comment.objects.create(author=self.user, post=self.old,
+                               text='Старый комментарий')
+
+    def archive(self):
+        call_command('archive_posts', batch=2, stdout=StringIO())
+
+    def texts(self, page):
+        return [post.text for post in page]
+
+    def test_moves_old_posts(self):
+        """Старые посты с комментариями уходят из горячей таблицы."""
+        self.archive()
+        self.assertEqual(Post.objects.count(), NUM_OF_POSTS - NUM_OF_OLD)
+        self.assertFalse(Comment.objects.filter(post=self.old).exists())
+        self.assertEqual(archive.ArchivedPosts().count(), NUM_OF_OLD)
+        # повторный запуск ничего не находит и ничего не ломает
+        self.archive()
+        self.assertEqual(archive.ArchivedPosts().count(), NUM_OF_OLD)
+
+    def test_listings_continue_into_archive(self):
+        """Курсор и номера страниц листают ленту дальше в архив."""
+        self.archive()
+        expected = [f'Пост {i}' for i in reversed(range(NUM_OF_POSTS))]
+        for name, kwargs in [('posts:index', {}),
+                             ('posts:group_posts', {'slug': 'g'}),
+                             ('posts:profile', {'username': 'auth'})]:
+            with self.subTest(name=name):
+                url = reverse(name, kwargs=kwargs)
+                first = self.client.get(url).context['page_obj']
+                second = self.client.get(
+                    url, {'after': first.next_cursor}).context['page_obj']
+                self.assertEqual(self.texts(first) + self.texts(second),
+                                 expected)
+                self.assertFalse(second.has_next())
+                back = self.client.get(
+                    url, {'before': second.previous_cursor})
+                self.assertEqual(self.texts(back.context['page_obj']),
+                                 expected[:10])
+                numbered = self.client.get(url, {'page': 2})
+                self.assertEqual(
+                    self.texts(numbered.context['page_obj']), expected[10:])
+
+    def test_old_hot_posts_merge_with_archive(self):
+        """Импортированный после архивации старый пост встаёт по дате."""
+        self.archive()
+        imported = Post.objects.create(author=self.user, group=self.group,
+                                       text='Импорт')
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.now() - timedelta(days=900))
+        expected = ([f'Пост {i}' for i in reversed(range(NUM_OF_POSTS))]
+                    + ['Импорт'])
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.next_cursor}).context['page_obj']
+        self.assertEqual(self.texts(first) + self.texts(second), expected)
+        numbered = self.client.get(url, {'page': 2})
+        self.assertEqual(self.texts(numbered.context['page_obj']),
+                         expected[10:])
+
+    def test_before_skips_older_archive(self):
+        """Листание к новым не трогает архив, который старше страницы."""
+        self.archive()
+        oldest_hot = Post.objects.get(pk=self.posts[NUM_OF_OLD].pk)
+        cursor = encode_cursor(oldest_hot, ('pub_date', 'id'))
+        with mock.patch.object(archive.ArchivedPosts, 'newer') as newer:
+            response = self.client.get(reverse('posts:index'),
+                                       {'before': cursor})
+        newer.assert_not_called()
+        self.assertEqual(len(response.context['page_obj']),
+                         NUM_OF_POSTS - NUM_OF_OLD - 1)
+
+    def test_archived_post_detail(self):
+        """Страница и комментарии архивного поста читаются из архива."""
+        self.archive()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.old.pk}))
+        self.assertContains(response, 'Пост 0')
+        self.assertContains(response, 'Старый комментарий')
+        self.assertEqual(response.context['comments_count'], 1)
+        self.assertNotContains(response, 'Добавить комментарий')
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.old.pk}),
+            {'format': 'json'})
+        self.assertEqual(response.json()['comments'][0]['text'],
+                         'Старый комментарий')
+        missing = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 10 ** 6}))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_post_count_includes_archive(self):
+        """Счётчик постов автора не теряет архивные посты."""
+        self.archive()
+        self.assertEqual(UserStats.objects.get(pk=self.user.pk).posts_count,
+                         NUM_OF_POSTS)
+        self.assertEqual(counters.reconcile(), 0)
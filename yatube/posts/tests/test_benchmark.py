@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, FeedItem, Follow, Group, Post, UserStats
+
+
+class SeedAndBenchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command('seed_data', users=30, groups=3, posts=200, follows=5,
+                     comments=100, seed=1, stdout=StringIO())
+
+    def test_seed_data(self):
+        """Объёмы совпадают, производные данные досчитаны."""
+        self.assertEqual(UserStats.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedItem.objects.exists())
+        # даты разбросаны, а не проставлены auto_now_add
+        self.assertGreater(Post.objects.dates('pub_date', 'day').count(), 10)
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        self.assertIn('найдено: 0', out.getvalue())
+
+    def test_bench_views(self):
+        """Бенчмарк обходит адреса и сохраняет JSON."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            out = StringIO()
+            call_command('bench_views', repeat=2, output=path, stdout=out)
+            call_command('bench_views', repeat=2, compare=path,
+                         stdout=out)
+            with open(path, encoding='utf-8') as file:
+                results = json.load(file)
+        self.assertIn('index', results)
+        self.assertNotIn('add_comment', results)
+        self.assertEqual(results['index']['status'], 200)
+        self.assertEqual(results['edit_post']['status'], 200)
+        self.assertGreater(results['index']['queries'], 0)
+        self.assertGreater(results['index']['rows'], 0)
+        self.assertIn('p50', out.getvalue())
+
+    def test_check_query_plans(self):
+        """Все запросы читающих страниц идут по индексам."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Все планы используют индексы', out.getvalue())
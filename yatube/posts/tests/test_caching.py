@@ -0,0 +1,271 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import caching, detail
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        self.post = Post.objects.create(author=self.user, text='Первый',
+                                        group=self.group)
+
+    def test_repeat_view_hits_cache(self):
+        """Повторный просмотр страницы не ходит в базу."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Первый')
+
+    def test_new_post_is_visible_immediately(self):
+        """Новый пост сразу виден на главной, в группе и профиле."""
+        urls = [reverse('posts:index'),
+                reverse('posts:group_posts', kwargs={'slug': 'g'}),
+                reverse('posts:profile', kwargs={'username': 'auth'})]
+        for url in urls:
+            self.client.get(url)
+        Post.objects.create(author=self.user, text='Второй',
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Второй')
+
+    def test_group_change_invalidates_old_group(self):
+        """Перенос поста в другую группу обновляет старую ленту группы."""
+        url = reverse('posts:group_posts', kwargs={'slug': 'g'})
+        self.assertContains(self.client.get(url), 'Первый')
+        self.post.group = Group.objects.create(title='h', slug='h',
+                                               description='d')
+        self.post.save()
+        self.assertNotContains(self.client.get(url), 'Первый')
+
+    def test_comment_invalidates_detail(self):
+        """Комментарий сбрасывает кеш страницы поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        Comment.objects.create(author=self.user, post=self.post,
+                               text='Комментарий')
+        self.assertContains(self.client.get(url), 'Комментарий')
+
+    def test_csrf_pages_are_not_cached(self):
+        """Страница с формой и CSRF-токеном не кешируется."""
+        self.client.force_login(self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_csrf_pages_have_no_etag(self):
+        """Страница поста с формой не получает ETag и не отвечает 304."""
+        self.client.force_login(self.user)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        key = caching.page_key(response.wsgi_request,
+                               'posts.views.post_detail',
+                               [f'post:{self.post.pk}', 'user:auth'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=f'"{key}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_conditional_get(self):
+        """Совпавший ETag даёт 304 без базы, правка меняет ETag."""
+        urls = [reverse('posts:group_posts', kwargs={'slug': 'g'}),
+                reverse('posts:profile', kwargs={'username': 'auth'}),
+                reverse('posts:post_detail',
+                        kwargs={'post_id': self.post.pk})]
+        etags = {}
+        for url in urls:
+            etags[url] = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url,
+                                           HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304)
+        Comment.objects.create(post=self.post, author=self.user, text='к')
+        self.post.text = 'Правка'
+        self.post.save()
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_etag_depends_on_user(self):
+        """Гость и пользователь получают разные ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_evicted_generation_never_repeats(self):
+        """Вытесненное поколение не возвращает старые страницы."""
+        before = caching.get_generations(['index'])
+        caching.bump('index')
+        cache.delete('gen:index')
+        self.assertNotEqual(caching.get_generations(['index']), before)
+
+    def test_scope_keys_are_ascii(self):
+        """Области с кириллицей и пробелами не попадают в ключ как есть."""
+        for scope in ['user:Пётр', 'group:a b', 'user:' + 'x' * 300]:
+            with self.subTest(scope=scope):
+                key = caching._generation_key(scope)
+                self.assertTrue(key.isascii() and ' ' not in key)
+                self.assertLess(len(key), 250)
+                caching.bump(scope)
+        self.assertEqual(caching._generation_key('index'), 'gen:index')
+
+    @skipUnless(isinstance(caches['default'], LocMemCache), 'не LocMemCache')
+    @override_settings(LOCAL_CACHE_TIMEOUT=20)
+    def test_locmem_pages_expire_quickly(self):
+        """С LocMemCache страница живёт не дольше LOCAL_CACHE_TIMEOUT."""
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get(reverse('posts:index'))
+        timeouts = [call.args[2] for call in cache_set.call_args_list
+                    if call.args[0].startswith('page:')]
+        self.assertEqual(timeouts, [20])
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_bump_blocks_only_own_scopes(self):
+        """Пока реплики догоняют правку, не кешируются только её области."""
+        caching.bump('group:g')
+        self.assertTrue(caching._replicas_lagging(['index', 'group:g']))
+        self.assertFalse(caching._replicas_lagging(['index', 'user:auth']))
+
+    @override_settings(PAGE_CACHE_WAIT=0.1)
+    def test_single_flight(self):
+        """Пока страницу собирает другой воркер, ответ не кешируется."""
+        request = self.client.get(reverse('posts:index')).wsgi_request
+        cache.clear()
+        key = caching.page_key(request, 'posts.views.index', ['index'])
+        cache.add(key + ':lock', 1)
+        self.assertEqual(self.client.get(reverse('posts:index')).status_code,
+                         200)
+        self.assertIsNone(cache.get(key))
+        cache.delete(key + ':lock')
+        self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(key))
+
+
+class PostCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        self.post = Post.objects.create(author=self.user, text='Старый',
+                                        group=self.group)
+
+    def test_card_is_shared_between_pages(self):
+        """Карточка, отрендеренная на главной, переиспользуется в группе."""
+        self.client.get(reverse('posts:index'))
+        # меняем текст в обход save(): версия карточки прежняя
+        Post.objects.filter(pk=self.post.pk).update(text='Тайком')
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'g'}))
+        self.assertContains(response, 'Старый')
+
+    def test_edit_invalidates_card(self):
+        """Правка через post_edit обновляет карточку."""
+        self.client.get(reverse('posts:index'))
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:edit_post', kwargs={'post_id': self.post.pk}),
+            {'text': 'Новый', 'group': self.group.pk})
+        response = self.client.get(
+            reverse('posts:group_posts', kwargs={'slug': 'g'}))
+        self.assertContains(response, 'Новый')
+        self.assertNotContains(response, 'Старый')
+
+    def test_group_rename_invalidates_card(self):
+        """Новый slug группы сразу попадает в ссылку карточки."""
+        self.client.get(reverse('posts:index'))
+        self.group.slug = 'renamed'
+        self.group.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, reverse('posts:group_posts',
+                                              kwargs={'slug': 'renamed'}))
+        self.assertNotContains(response, reverse('posts:group_posts',
+                                                 kwargs={'slug': 'g'}))
+
+    def test_cards_fetched_in_one_round_trip(self):
+        """Все карточки страницы читаются одним get_many."""
+        Post.objects.bulk_create(Post(author=self.user, text=str(i))
+                                 for i in range(5))
+        self.client.get(reverse('posts:index'))
+        caching.bump('index')
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many:
+            self.client.get(reverse('posts:index'))
+        card_calls = [call for call in get_many.call_args_list
+                      if any(key.startswith('post-card:')
+                             for key in call.args[0])]
+        self.assertEqual(len(card_calls), 1)
+        self.assertEqual(len(card_calls[0].args[0]), 6)
+
+
+class PostDetailCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        self.post = Post.objects.create(author=self.author, text='Пост',
+                                        group=self.group)
+        for i in range(3):
+            Comment.objects.create(author=self.reader, post=self.post,
+                                   text=f'Комментарий {i}')
+        # счётчики прогреты: select_related находит строки статистики
+        detail.load(self.post.pk)
+        cache.clear()
+        caching.post_author(self.post.pk)
+
+    def test_cold_load_round_trips(self):
+        """Пост, автор, группа, счётчики и комментарии - два запроса."""
+        with self.assertNumQueries(2):
+            post_detail = detail.load(self.post.pk)
+            self.assertEqual(post_detail.post.author.username, 'author')
+            self.assertEqual(post_detail.post.group.slug, 'g')
+            self.assertEqual(post_detail.author_posts, 1)
+            self.assertEqual(post_detail.comments_count, 3)
+            self.assertEqual([comment.author.username
+                              for comment in post_detail.comments],
+                             ['reader'] * 3)
+
+    def test_repeat_load_hits_no_sql(self):
+        """Повторный просмотр, в том числе с формой, не трогает базу."""
+        detail.load(self.post.pk)
+        with self.assertNumQueries(0):
+            detail.load(self.post.pk)
+        self.client.force_login(self.reader)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            # только сессия и пользователь
+            response = self.client.get(url)
+        self.assertEqual(response.context['comments_count'], 3)
+
+    def test_new_author_post_changes_entry(self):
+        """Новый пост автора обновляет счётчик в закешированных данных."""
+        detail.load(self.post.pk)
+        Post.objects.create(author=self.author, text='Ещё')
+        self.assertEqual(detail.load(self.post.pk).author_posts, 2)
+
+    def test_missing_post(self):
+        """Несуществующий пост - None и 404."""
+        self.assertIsNone(detail.load(self.post.pk + 100))
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk + 100}))
+        self.assertEqual(response.status_code, 404)
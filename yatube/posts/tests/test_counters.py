@@ -0,0 +1,66 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, PostStats, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.author = User.objects.create_user(username='writer')
+
+    def stats(self, user):
+        return UserStats.objects.get(pk=user.pk)
+
+    def test_post_counter(self):
+        """Счётчик постов следует за созданием и удалением."""
+        post = Post.objects.create(author=self.author, text='post')
+        Post.objects.create(author=self.author, text='post 2')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики обеих сторон."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следует за комментариями."""
+        post = Post.objects.create(author=self.author, text='post')
+        comment = Comment.objects.create(author=self.user, post=post,
+                                         text='comment')
+        self.assertEqual(PostStats.objects.get(pk=post.pk).comments_count, 1)
+        comment.delete()
+        self.assertEqual(PostStats.objects.get(pk=post.pk).comments_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters чинит счётчики после bulk_create."""
+        Post.objects.create(author=self.author, text='post')
+        Post.objects.bulk_create(Post(author=self.author, text='bulk')
+                                 for _ in range(3))
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(self.stats(self.author).posts_count, 4)
+
+    def test_profile_uses_counters(self):
+        """Профиль показывает число постов из счётчика."""
+        Post.objects.create(author=self.author, text='post')
+        response = self.client.get(reverse('posts:profile',
+                                           kwargs={'username': 'writer'}))
+        self.assertEqual(response.context['post_count'], 1)
+        self.assertEqual(response.context['stats'].posts_count, 1)
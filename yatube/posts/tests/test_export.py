@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(title='g', slug='g', description='d')
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text=f'Пост "{number}",\nстрока')
+                     for number in range(3)]
+        Comment.objects.create(post=cls.posts[0], author=cls.staff,
+                               text='Комментарий')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:export_author', args=['writer']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_ndjson_posts(self):
+        """Автор выгружается построчным JSON в порядке публикации."""
+        response = self.client.get(
+            reverse('posts:export_author', args=['writer']))
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line)
+                for line in self.content(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.id for post in self.posts])
+        self.assertEqual(rows[0]['author'], 'writer')
+        self.assertEqual(rows[0]['group'], 'g')
+        self.assertEqual(rows[0]['text'], 'Пост "0",\nстрока')
+
+    def test_csv_comments(self):
+        """Комментарии группы выгружаются в CSV с заголовком."""
+        response = self.client.get(
+            reverse('posts:export_group', args=['g']),
+            {'format': 'csv', 'kind': 'comments'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(self.content(response))))
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'created', 'text'])
+        self.assertEqual(rows[1][1:3], [str(self.posts[0].id), 'staff'])
+        self.assertEqual(len(rows), 2)
+
+    def test_archived_rows_follow_hot(self):
+        """Архивные посты и их комментарии идут после горячих."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(archive._local.__dict__.clear)
+        path = os.path.join(directory.name, 'archive.sqlite3')
+        with override_settings(ARCHIVE_PATH=path):
+            old = Post.objects.create(author=self.author, group=self.group,
+                                      text='Старый')
+            Comment.objects.create(post=old, author=self.staff,
+                                   text='В архиве')
+            Post.objects.filter(pk=old.pk).update(
+                pub_date=timezone.now() - timedelta(days=400))
+            archive.archive_batch(archive.cutoff())
+            posts = self.content(self.client.get(
+                reverse('posts:export_author', args=['writer'])))
+            comments = self.content(self.client.get(
+                reverse('posts:export_group', args=['g']),
+                {'kind': 'comments'}))
+        rows = [json.loads(line) for line in posts.splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.id for post in self.posts] + [old.id])
+        self.assertEqual(rows[-1]['group'], 'g')
+        rows = [json.loads(line) for line in comments.splitlines()]
+        self.assertEqual([(row['post'], row['text']) for row in rows],
+                         [(self.posts[0].id, 'Комментарий'),
+                          (old.id, 'В архиве')])
+
+    def test_bad_format(self):
+        response = self.client.get(
+            reverse('posts:export_group', args=['g']), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        """Команда пишет CSV постов в файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.csv')
+            call_command('export_posts', '--group=g', format='csv',
+                         output=path, stderr=StringIO())
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = list(csv.reader(file))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][4], 'Пост "0",\nстрока')
@@ -0,0 +1,94 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import feed
+from ..models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.old_post = Post.objects.create(author=self.author, text='old')
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает."""
+        self.client.force_login(self.reader)
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'writer'}))
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'writer'}))
+        self.assertFalse(FeedItem.objects.filter(user=self.reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='fresh')
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertIn(post, feed.feed_posts(self.reader))
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    def test_trim(self):
+        """Лента обрезается до FEED_MAX_LENGTH последних постов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        newest = [Post.objects.create(author=self.author, text=str(i))
+                  for i in range(3)][-2:]
+        call_command('trim_feeds', stdout=StringIO())
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post', flat=True)),
+            {post.pk for post in newest})
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    def test_fan_out_keeps_cap(self):
+        """Раздача не растит ленту дальше FEED_MAX_LENGTH."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(3)]
+        self.assertEqual(
+            set(FeedItem.objects.filter(user=self.reader)
+                .values_list('post', flat=True)),
+            {post.pk for post in posts[-2:]})
+
+    @override_settings(FEED_MAX_LENGTH=2)
+    @mock.patch.object(feed, 'REBUILD_CHUNK', 1)
+    def test_rebuild_keeps_newest(self):
+        """Пересборка кладёт в ленту только свежие FEED_MAX_LENGTH."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author),
+            Follow(user=self.reader, author=other),
+            Follow(user=other, author=self.author)])
+        Post.objects.bulk_create(
+            Post(author=author, text=str(i))
+            for i, author in enumerate([self.author, other] * 2))
+        feed.rebuild()
+        newest = Post.objects.order_by('-pub_date', '-id')
+        self.assertEqual(
+            list(FeedItem.objects.filter(user=self.reader)
+                 .order_by('-pub_date', '-post')
+                 .values_list('post', flat=True)),
+            [post.pk for post in newest[:2]])
+        self.assertEqual(FeedItem.objects.filter(user=other).count(), 2)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_heavy_author_is_pulled(self):
+        """Посты тяжёлого автора не раздаются, а читаются при запросе."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='popular')
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        self.assertIn(post, feed.feed_posts(self.reader))
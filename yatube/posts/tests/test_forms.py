@@ -1,10 +1,18 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 from ..models import Post, Comment, Group
 from http import HTTPStatus
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
 class PostCreateForm(TestCase):
@@ -127,3 +135,55 @@ class CommentTestCase(TestCase):
         self.assertEqual(comments_prev + 1,
                          Comment.objects.filter(post=CommentTestCase
                                                 .post).count())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=1000,
+                   IMAGE_FORMAT='JPEG')
+class ImageUploadTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.client.force_login(self.user)
+
+    def upload(self, name, image, fmt, **params):
+        buffer = BytesIO()
+        image.save(buffer, fmt, **params)
+        self.client.post(reverse('posts:create_post'), {
+            'text': name,
+            'image': SimpleUploadedFile(name, buffer.getvalue()),
+        })
+        return Post.objects.get(text=name).image
+
+    def test_large_png_is_shrunk_to_jpeg(self):
+        """Большой PNG с прозрачностью уменьшается и пересохраняется."""
+        stored = self.upload('big.png',
+                             Image.new('RGBA', (3000, 1500), (0, 0, 0, 0)),
+                             'PNG')
+        self.assertEqual(stored.name, 'posts/big.jpg')
+        with Image.open(stored.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (1000, 500))
+            # прозрачное стало белым
+            self.assertEqual(image.getpixel((10, 10)), (255, 255, 255))
+
+    def test_exif_is_applied_and_stripped(self):
+        """Поворот из EXIF применяется, сами метаданные удаляются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        stored = self.upload('phone.jpg', Image.new('RGB', (400, 200)),
+                             'JPEG', exif=exif.tobytes())
+        with Image.open(stored.path) as image:
+            self.assertEqual(image.size, (200, 400))
+            self.assertNotIn('exif', image.info)
+        originals = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'originals')
+        self.assertFalse(os.path.exists(originals))
+
+    @override_settings(IMAGE_KEEP_ORIGINAL=True)
+    def test_keep_original(self):
+        self.upload('keep.png', Image.new('RGB', (50, 50)), 'PNG')
+        self.assertTrue(os.path.exists(os.path.join(
+            TEMP_MEDIA_ROOT, 'posts', 'originals', 'keep.png')))
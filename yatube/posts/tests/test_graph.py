@@ -0,0 +1,116 @@
+from array import array
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(username=name)
+            for name in ('alice', 'bob', 'carol'))
+
+    def follow(self, user, author):
+        return Follow.objects.create(user=user, author=author)
+
+    def test_signals_update_cached_arrays(self):
+        """Подписки правят уже загруженные массивы без запросов."""
+        self.follow(self.alice, self.bob)
+        self.assertTrue(graph.is_following(self.alice.id, self.bob.id))
+        graph.followers(self.carol.id)
+        self.follow(self.alice, self.carol)
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.is_following(self.alice.id,
+                                               self.carol.id))
+            self.assertEqual(list(graph.followers(self.carol.id)),
+                             [self.alice.id])
+            self.assertEqual(graph.following_count(self.alice.id), 2)
+        Follow.objects.filter(user=self.alice, author=self.bob).delete()
+        self.assertFalse(graph.is_following(self.alice.id, self.bob.id))
+        self.assertEqual(graph.followers_count(self.bob.id), 0)
+
+    def test_busy_lock_invalidates(self):
+        """Если массив правит кто-то ещё, он сбрасывается, а не теряет
+        правку."""
+        graph.following(self.alice.id)
+        cache.add('graph:following:%d:lock' % self.alice.id, 1)
+        self.follow(self.alice, self.bob)
+        self.assertIsNone(cache.get('graph:following:%d' % self.alice.id))
+        self.assertTrue(graph.is_following(self.alice.id, self.bob.id))
+
+    def test_load_racing_update_is_not_cached(self):
+        """Массив, прочитанный до правки, не затирает её в кеше."""
+        def stale_load(direction, user_id):
+            # правка прошла, пока массив читался из базы
+            self.follow(self.alice, self.bob)
+            return array('i')
+
+        with mock.patch.object(graph, '_load', side_effect=stale_load):
+            self.assertEqual(list(graph.following(self.alice.id)), [])
+        self.assertIsNone(cache.get('graph:following:%d' % self.alice.id))
+        self.assertTrue(graph.is_following(self.alice.id, self.bob.id))
+
+    @override_settings(
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        LOCAL_CACHE_TIMEOUT=20)
+    def test_locmem_arrays_expire_quickly(self):
+        """С LocMemCache массивы живут не дольше LOCAL_CACHE_TIMEOUT."""
+        key = 'graph:following:%d' % self.alice.id
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'set', wraps=cache.set) as put:
+            graph.following(self.alice.id)
+            self.follow(self.alice, self.bob)
+        timeouts = [call.args[2]
+                    for call in add.call_args_list + put.call_args_list
+                    if call.args[0] == key]
+        self.assertEqual(timeouts, [20, 20])
+
+    def test_mutual(self):
+        self.follow(self.alice, self.bob)
+        self.follow(self.bob, self.alice)
+        self.follow(self.alice, self.carol)
+        self.assertEqual(list(graph.mutual(self.alice.id)), [self.bob.id])
+
+    def test_follow_list_pages(self):
+        """Страницы подписчиков и подписок строятся по графу."""
+        self.follow(self.alice, self.bob)
+        self.follow(self.bob, self.alice)
+        self.follow(self.carol, self.bob)
+        response = self.client.get(
+            reverse('posts:profile_followers', args=['bob']))
+        self.assertEqual([user.username for user, _ in
+                          response.context['users']], ['alice', 'carol'])
+        self.assertEqual([mutual for _, mutual in
+                          response.context['users']], [True, False])
+        response = self.client.get(
+            reverse('posts:profile_following', args=['carol']))
+        self.assertContains(response, 'bob')
+
+    def test_profile_follow_is_idempotent(self):
+        self.client.force_login(self.alice)
+        url = reverse('posts:profile_follow', args=['bob'])
+        self.client.get(url)
+        # граф забыл подписку, повторная не падает
+        cache.clear()
+        cache.set('graph:following:%d' % self.alice.id, b'', None)
+        self.client.get(url)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_profile_follow_ignores_stale_graph(self):
+        """Устаревший граф с лишней подпиской не мешает подписаться."""
+        cache.set('graph:following:%d' % self.alice.id,
+                  array('i', [self.bob.id]).tobytes(), None)
+        self.client.force_login(self.alice)
+        self.client.get(reverse('posts:profile_follow', args=['bob']))
+        self.assertTrue(Follow.objects.filter(user=self.alice,
+                                              author=self.bob).exists())
@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..management.commands.import_posts import Command
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer')
+        Group.objects.create(title='g', slug='g', description='d')
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'posts.ndjson')
+        with open(os.path.join(self.directory.name, 'cat.gif'), 'wb') as file:
+            file.write(b'GIF89a')
+        rows = [{'author': 'writer', 'group': 'g', 'text': f'Пост {number}',
+                 'pub_date': f'2020-01-0{number + 1}T10:00:00+00:00',
+                 'image': 'cat.gif' if number == 0 else ''}
+                for number in range(5)]
+        rows.append({'author': 'nobody', 'text': 'без автора'})
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command('import_posts', self.path, '--batch=2',
+                     f'--media-source={self.directory.name}', *args,
+                     stdout=out)
+        return out.getvalue()
+
+    def test_import(self):
+        """Посты загружаются с датами, группой и скопированной картинкой."""
+        output = self.run_import()
+        self.assertIn('строк/с', output)
+        self.assertIn('пропущено 1', output)
+        posts = Post.objects.order_by('pub_date')
+        self.assertEqual([post.text for post in posts],
+                         [f'Пост {number}' for number in range(5)])
+        self.assertEqual(posts[0].pub_date.day, 1)
+        self.assertEqual(posts[0].group.slug, 'g')
+        self.assertTrue(os.path.exists(posts[0].image.path))
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+        # поиск и счётчики досчитаны после bulk_create
+        self.assertEqual(self.author.stats.posts_count, 5)
+
+    def test_resume_after_crash(self):
+        """После сбоя импорт продолжается без дублей."""
+        original = Command.save_checkpoint
+        calls = []
+
+        def crash_after_commit(command, state):
+            calls.append(state['done'])
+            # вторая пачка уже записана, а точка не сохранена
+            if state['done'] == 4:
+                raise RuntimeError('сбой')
+            original(command, state)
+
+        with mock.patch.object(Command, 'save_checkpoint',
+                               crash_after_commit):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(Post.objects.count(), 4)
+        # пока импорт стоит, сайт создаёт пост вне зарезервированных id
+        Post.objects.create(author=self.author, text='с сайта')
+        output = self.run_import()
+        self.assertIn('Продолжаем со строки 3', output)
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Post.objects.filter(text='Пост 2').count(), 1)
+
+    def test_comments(self):
+        self.run_import()
+        post = Post.objects.get(text='Пост 0')
+        path = os.path.join(self.directory.name, 'comments.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('post,author,created,text\n'
+                       f'{post.id},writer,2020-02-01T00:00:00+00:00,ок\n'
+                       '999999,writer,,потерянный\n')
+        call_command('import_posts', path, '--kind=comments',
+                     stdout=StringIO())
+        self.assertEqual(list(Comment.objects.values_list('text', flat=True)),
+                         ['ок'])
+        self.assertEqual(post.stats.comments_count, 1)
+
+    def test_export_import_round_trip(self):
+        """Комментарии выгрузки попадают к новым копиям своих постов."""
+        Post.objects.create(author=self.author, text='Первый')
+        second = Post.objects.create(author=self.author, text='Второй')
+        Comment.objects.create(author=self.author, post=second,
+                               text='ко второму')
+        posts_path = os.path.join(self.directory.name, 'export.ndjson')
+        comments_path = os.path.join(self.directory.name, 'export.csv')
+        call_command('export_posts', '--author=writer',
+                     f'--output={posts_path}', stderr=StringIO())
+        call_command('export_posts', '--author=writer', '--kind=comments',
+                     '--format=csv', f'--output={comments_path}',
+                     stderr=StringIO())
+        # в базе уже есть посты: новые id не совпадают с id выгрузки
+        call_command('import_posts', posts_path, stdout=StringIO())
+        with open(posts_path + '.ids', encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 2)
+        call_command('import_posts', comments_path, '--kind=comments',
+                     f'--id-map={posts_path}.ids', stdout=StringIO())
+        copy = Post.objects.filter(text='Второй').latest('pk')
+        self.assertNotEqual(copy.pk, second.pk)
+        self.assertEqual(list(copy.comments.values_list('text', flat=True)),
+                         ['ко второму'])
+        self.assertEqual(second.comments.count(), 1)
@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+NUM_OF_AUTHORS = 10
+
+# Сколько SQL-запросов может сделать страница при полной ленте.
+# Бюджет не зависит от числа постов на странице: если он
+# превышен, значит, в шаблоне или во view появился N+1.
+QUERY_BUDGETS = {
+    'posts:index': 1,
+    'posts:group_posts': 2,
+    'posts:profile': 2,
+    # автор поста для ключа кеша, пост со счётчиками, комментарии
+    'posts:post_detail': 3,
+    # сессия, пользователь, сама лента и рекомендации
+    'posts:follow_index': 4,
+}
+
+
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в заявленное число запросов."""
+
+    def assertQueryBudget(self, client, url, budget):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(query['sql']
+                                for query in context.captured_queries)
+            self.fail(f'{url}: {executed} запросов при бюджете '
+                      f'{budget}:\n{queries}')
+
+
+class ViewQueryBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        # разные авторы, чтобы N+1 по автору не прятался за кешем ORM
+        for i in range(NUM_OF_AUTHORS):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(author=author,
+                                       group=cls.group,
+                                       text=f'Пост {i}')
+            Comment.objects.create(author=author, post=post,
+                                   text=f'Комментарий {i}')
+        cls.post = post
+        Post.objects.bulk_create(
+            Post(author=cls.post.author, text='Ещё пост')
+            for _ in range(NUM_OF_AUTHORS)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ViewQueryBudgetTest.reader)
+
+    def test_list_views_within_budget(self):
+        """Страницы укладываются в бюджет SQL-запросов."""
+        pages = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile',
+                kwargs={'username': self.post.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+        }
+        for name, url in pages.items():
+            with self.subTest(view=name):
+                self.assertQueryBudget(self.client, url, QUERY_BUDGETS[name])
+
+    def test_follow_index_within_budget(self):
+        """Лента подписок укладывается в бюджет SQL-запросов."""
+        # первый запрос прогревает кеш тяжёлых авторов
+        self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertQueryBudget(self.authorized_client,
+                               reverse('posts:follow_index'),
+                               QUERY_BUDGETS['posts:follow_index'])
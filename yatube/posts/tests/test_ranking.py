@@ -0,0 +1,103 @@
+import math
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import ranking
+from ..models import Comment, Group, Post, PostScore
+
+User = get_user_model()
+
+
+class RankingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        self.quiet = Post.objects.create(author=self.user, text='Тихий')
+        self.hot = Post.objects.create(author=self.user, text='Горячий',
+                                       group=self.group)
+
+    def comment(self, post, hours_ago=0):
+        comment = Comment.objects.create(author=self.user, post=post,
+                                         text='к')
+        if hours_ago:
+            Comment.objects.filter(pk=comment.pk).update(
+                created=timezone.now() - timedelta(hours=hours_ago))
+        return comment
+
+    def test_score_is_log_of_decayed_sum(self):
+        """Оценка - логарифм суммы весов, вес вдвое меньше за период."""
+        now = timezone.now()
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        expected = math.log(
+            math.exp(ranking.term(now, 3) - ranking.term(now))
+            + 1 + 0.5)
+        value = ranking.score(now, [now, now - half_life])
+        self.assertAlmostEqual(value - ranking.term(now), expected)
+
+    def test_comment_updates_score_incrementally(self):
+        """Новый комментарий поднимает пост, итог совпадает с пересчётом."""
+        self.comment(self.hot)
+        self.comment(self.hot)
+        self.assertEqual(ranking.top()[0], self.hot)
+        incremental = PostScore.objects.get(pk=self.hot.pk).score
+        ranking.rescore()
+        self.assertAlmostEqual(PostScore.objects.get(pk=self.hot.pk).score,
+                               incremental)
+
+    def test_old_comments_decay(self):
+        """Вчерашнее обсуждение уступает свежему комментарию."""
+        for _ in range(5):
+            self.comment(self.hot, hours_ago=48)
+        self.comment(self.quiet)
+        ranking.rescore()
+        self.assertEqual(ranking.top()[0], self.quiet)
+
+    def test_group_top(self):
+        """Топ группы - только её посты, перенос поста учитывается."""
+        self.assertEqual(ranking.top(self.group), [self.hot])
+        self.hot.group = None
+        self.hot.save()
+        self.assertEqual(ranking.top(self.group), [])
+
+    def test_top_reads_page_size_rows(self):
+        """Топ - срез индекса и один запрос за постами."""
+        with self.assertNumQueries(2):
+            ranking.top(limit=1)
+
+    def test_pages(self):
+        """Страницы обсуждаемого показывают посты и обновляются."""
+        url = reverse('posts:trending')
+        group_url = reverse('posts:group_trending', kwargs={'slug': 'g'})
+        self.assertContains(self.client.get(url), 'Тихий')
+        response = self.client.get(group_url)
+        self.assertContains(response, 'Горячий')
+        self.assertNotContains(response, 'Тихий')
+        Post.objects.create(author=self.user, text='Новый')
+        self.assertContains(self.client.get(url), 'Новый')
+        self.hot.text = 'Правка'
+        self.hot.save()
+        self.assertContains(self.client.get(url), 'Правка')
+        post_id = self.hot.pk
+        self.hot.delete()
+        self.assertFalse(PostScore.objects.filter(pk=post_id).exists())
+        self.assertNotContains(self.client.get(url), 'Правка')
+        missing = reverse('posts:group_trending', kwargs={'slug': 'nope'})
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_rank_posts_command(self):
+        """Команда пересчитывает все посты, включая потерянные оценки."""
+        PostScore.objects.all().delete()
+        out = StringIO()
+        call_command('rank_posts', batch=1, stdout=out)
+        self.assertIn('Пересчитано постов: 2', out.getvalue())
+        self.assertEqual(PostScore.objects.count(), 2)
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from ..search import build_match, search_ids
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.cats = Post.objects.create(
+            author=self.user, text='Коты <b>любят</b> спать на солнце')
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собаки любят гулять')
+
+    def test_build_match_quotes_terms(self):
+        """Синтаксис FTS5 из ввода не проходит в MATCH."""
+        self.assertEqual(build_match('кот OR "NEAR"'),
+                         '"кот" "OR" "NEAR"*')
+        self.assertEqual(build_match('  !!! '), '')
+
+    def test_search_page(self):
+        """Поиск находит пост и подсвечивает совпадение."""
+        response = self.client.get(reverse('posts:search'), {'q': 'коты'})
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [self.cats])
+        self.assertContains(response, '<mark>Коты</mark>')
+        # текст поста экранирован, подсвечены только совпадения
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_capped_count_is_lower_bound(self):
+        """Счёт, упёршийся в MAX_RESULTS, показан как нижняя граница."""
+        url = reverse('posts:search')
+        self.assertContains(self.client.get(url, {'q': 'люб'}),
+                            'Найдено: 2</p>')
+        with mock.patch.object(search, 'MAX_RESULTS', 1):
+            response = self.client.get(url, {'q': 'люб'})
+        self.assertContains(response, 'Найдено: 1+')
+
+    def test_prefix_and_ranking(self):
+        """Последнее слово ищется по префиксу."""
+        self.assertEqual(set(search_ids('люб')), {self.cats.pk, self.dogs.pk})
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.dogs.text = 'Попугаи болтают'
+        self.dogs.save()
+        self.assertEqual(search_ids('собаки'), [])
+        self.assertEqual(search_ids('попугаи'), [self.dogs.pk])
+        self.dogs.delete()
+        self.assertEqual(search_ids('попугаи'), [])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через тот же индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'гулять'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dogs])
@@ -0,0 +1,119 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import snapshots
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+TEMP_SNAPSHOTS_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SNAPSHOTS_ROOT=TEMP_SNAPSHOTS_ROOT)
+class SnapshotsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_SNAPSHOTS_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_SNAPSHOTS_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        self.post = Post.objects.create(author=self.user, text='Первый',
+                                        group=self.group)
+        self.post_url = reverse('posts:post_detail',
+                                kwargs={'post_id': self.post.pk})
+
+    def read(self, url, suffix=''):
+        path = os.path.join(TEMP_SNAPSHOTS_ROOT, url.strip('/'),
+                            'index.html' + suffix)
+        with open(path, 'rb') as file:
+            content = file.read()
+        return gzip.decompress(content) if suffix else content
+
+    def serve(self, url, **environ):
+        inner = mock.Mock(return_value=[b'django'])
+        app = snapshots.SnapshotApp(inner)
+        start_response = mock.Mock()
+        request = RequestFactory().get(url, **environ)
+        body = b''.join(app(request.environ, start_response))
+        return body, start_response, inner
+
+    def test_publish_all(self):
+        """Команда выкладывает главную, группу, профиль и пост."""
+        out = StringIO()
+        call_command('publish_snapshots', stdout=out)
+        self.assertIn('Снимков: 4 из 4', out.getvalue())
+        for url in ['/', '/group/g/', '/profile/auth/', self.post_url]:
+            with self.subTest(url=url):
+                self.assertIn('Первый', self.read(url).decode())
+                self.assertEqual(self.read(url, '.gz'), self.read(url))
+
+    def test_refresh_scopes(self):
+        """Правки перерисовывают страницы, удалённые стираются."""
+        snapshots.refresh(['index', f'post:{self.post.pk}'])
+        Comment.objects.create(author=self.user, post=self.post,
+                               text='Комментарий')
+        snapshots.refresh([f'post:{self.post.pk}'])
+        self.assertIn('Комментарий', self.read(self.post_url).decode())
+        # новый пост автора меняет уже выложенную страницу поста;
+        # невыложенные страницы его постов не перерисовываются
+        Post.objects.create(author=self.user, text='Не выложен')
+        self.assertEqual(
+            snapshots.urls_for('user:auth'),
+            [reverse('posts:profile', kwargs={'username': 'auth'}),
+             self.post_url])
+        post_id = self.post.pk
+        self.post.delete()
+        snapshots.refresh([f'post:{post_id}'])
+        self.assertFalse(snapshots.is_published(self.post_url))
+
+    def test_bump_schedules_scopes(self):
+        """Сигналы отдают в очередь те же области, что и кешу страниц."""
+        with mock.patch.object(snapshots, 'schedule') as schedule:
+            Post.objects.create(author=self.user, text='Второй')
+        scopes = [scope for call in schedule.call_args_list
+                  for scope in call[0][0]]
+        self.assertIn('index', scopes)
+        self.assertIn('user:auth', scopes)
+
+    def test_app_serves_anonymous(self):
+        """Аноним получает файл с диска, остальные - Django."""
+        snapshots.publish('/')
+        body, start_response, inner = self.serve('/')
+        self.assertIn('Первый', body.decode())
+        inner.assert_not_called()
+        # те же заголовки безопасности, что у ответа Django
+        headers = dict(start_response.call_args[0][1])
+        response = self.client.get('/')
+        expected = {name: response[name]
+                    for name in snapshots.SECURITY_HEADERS
+                    if response.has_header(name)}
+        self.assertIn('X-Frame-Options', expected)
+        self.assertEqual({name: headers.get(name) for name in expected},
+                         expected)
+        body, start_response, inner = self.serve(
+            '/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertIn(('Content-Encoding', 'gzip'),
+                      start_response.call_args[0][1])
+        self.assertIn('Первый', gzip.decompress(body).decode())
+        for url, environ in [
+                ('/', {'HTTP_COOKIE': f'{settings.SESSION_COOKIE_NAME}=x'}),
+                ('/?page=2', {}),
+                ('/group/g/', {})]:
+            with self.subTest(url=url):
+                body, start_response, inner = self.serve(url, **environ)
+                self.assertEqual(body, b'django')
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, FollowSuggestion
+
+User = get_user_model()
+
+
+class SuggestionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {name: User.objects.create_user(username=name)
+                      for name in ['me', 'friend', 'twin', 'star', 'fof',
+                                   'niche']}
+        edges = [('me', 'friend'), ('me', 'star'),
+                 # друг друга
+                 ('friend', 'fof'),
+                 # twin читает то же, что и me, и ещё niche
+                 ('twin', 'friend'), ('twin', 'star'), ('twin', 'niche')]
+        for user, author in edges:
+            self.follow(user, author)
+
+    def follow(self, user, author):
+        return Follow.objects.create(user=self.users[user],
+                                     author=self.users[author])
+
+    def names(self, user):
+        return [suggestion.author.username
+                for suggestion in suggestions.for_user(self.users[user])]
+
+    def test_matrix(self):
+        """CSR-матрица отдаёт отсортированные подписки и подписчиков."""
+        matrix = suggestions.FollowMatrix()
+        self.assertEqual(len(matrix), 6)
+        self.assertEqual(list(matrix.following(self.users['me'].pk)),
+                         sorted([self.users['friend'].pk,
+                                 self.users['star'].pk]))
+        self.assertEqual(len(matrix.followers(self.users['star'].pk)), 2)
+        self.assertEqual(list(matrix.following(self.users['niche'].pk)), [])
+
+    def test_rebuild(self):
+        """Друзья друзей и совместные подписки, без уже прочитанных."""
+        self.assertEqual(suggestions.rebuild(batch=2), 3)
+        names = self.names('me')
+        self.assertEqual(set(names), {'fof', 'niche'})
+        # niche дают совместные подписки с весом 2, fof - один путь
+        self.assertEqual(names[0], 'niche')
+        self.assertNotIn('me', self.names('twin'))
+
+    @override_settings(SUGGESTIONS_FANIN_LIMIT=1)
+    def test_popular_authors_give_no_neighbours(self):
+        """Авторы с большой аудиторией не связывают читателей."""
+        suggestions.rebuild()
+        self.assertEqual(self.names('me'), ['fof'])
+
+    def test_follow_drops_suggestion_and_rebuild_clears(self):
+        """Подписка убирает рекомендацию, отписка от всех - все."""
+        suggestions.rebuild()
+        self.follow('me', 'niche')
+        self.assertNotIn('niche', self.names('me'))
+        Follow.objects.filter(user=self.users['me']).delete()
+        suggestions.rebuild()
+        self.assertEqual(self.names('me'), [])
+
+    def test_pages_show_suggestions(self):
+        """Рекомендации видны в профиле и в ленте подписок."""
+        call_command('suggest_follows', stdout=StringIO())
+        self.client.force_login(self.users['me'])
+        for url in [reverse('posts:follow_index'),
+                    reverse('posts:profile', kwargs={'username': 'star'})]:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Кого почитать')
+
+    def test_follow_refreshes_cached_profiles(self):
+        """После подписки автор пропадает из блока на чужих профилях."""
+        suggestions.rebuild()
+        self.client.force_login(self.users['me'])
+        url = reverse('posts:profile', kwargs={'username': 'star'})
+        niche = reverse('posts:profile', kwargs={'username': 'niche'})
+        self.assertContains(self.client.get(url), niche)
+        self.follow('me', 'niche')
+        self.assertNotContains(self.client.get(url), niche)
+
+    def test_lookup_is_one_query(self):
+        """Рекомендации читаются одним запросом."""
+        suggestions.rebuild()
+        with self.assertNumQueries(1):
+            self.names('me')
+        self.assertEqual(
+            FollowSuggestion.objects.filter(user=self.users['me']).count(), 2)
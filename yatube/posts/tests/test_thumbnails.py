@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (100, 60), 'red').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='red.jpg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='с картинкой',
+                                        image=make_image())
+
+    def test_render_never_builds_thumbnail(self):
+        """Страница показывает заглушку и ставит картинку в очередь."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule, \
+                mock.patch.object(thumbnails, 'generate') as generate:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'thumbnail_placeholder.svg')
+        schedule.assert_called_with(self.post.image.name)
+        generate.assert_not_called()
+
+    def test_generated_thumbnail_is_used(self):
+        """После генерации страница ссылается на готовую миниатюру."""
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'card'))
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        thumbnail = thumbnails.lookup(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+
+    def test_ready_thumbnail_replaces_cached_placeholder(self):
+        """Готовая миниатюра сбрасывает страницы и карточки с заглушкой."""
+        url = reverse('posts:index')
+        with mock.patch.object(thumbnails, 'schedule'):
+            self.assertContains(self.client.get(url),
+                                'thumbnail_placeholder.svg')
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image, 'card')
+        response = self.client.get(url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'thumbnail_placeholder.svg')
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Post
+from ..utils import CursorPaginator, decode_cursor
+
+User = get_user_model()
+PER_PAGE = 10
+TOTAL_POSTS = 23
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        # bulk_create даёт почти одинаковые pub_date,
+        # порядок держится на id
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}')
+            for i in range(TOTAL_POSTS)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+
+    def test_walk_forward_and_back(self):
+        """Проход вперёд и назад по курсорам возвращает все посты."""
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        first = self.paginator.get_page()
+        self.assertFalse(first.has_previous())
+        second = self.paginator.get_page(after=first.next_cursor)
+        third = self.paginator.get_page(after=second.next_cursor)
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(first) + list(second) + list(third), expected)
+
+        back = self.paginator.get_page(before=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        back = self.paginator.get_page(before=back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_page_is_single_query(self):
+        """Глубокая страница стоит один запрос без COUNT(*)."""
+        first = self.paginator.get_page()
+        with self.assertNumQueries(1):
+            page = self.paginator.get_page(after=first.next_cursor)
+            self.assertEqual(len(page), PER_PAGE)
+
+    def test_broken_token(self):
+        """Битый токен открывает первую страницу."""
+        self.assertIsNone(decode_cursor('!!!'))
+        page = self.paginator.get_page(after='bm9uc2Vuc2U')
+        self.assertEqual(list(page), list(self.paginator.get_page()))
+
+    def test_view_uses_cursor(self):
+        """Лента отдаёт ссылку на следующую страницу по курсору."""
+        response = self.client.get('/profile/auth/')
+        page_obj = response.context['page_obj']
+        self.assertContains(response, f'?after={page_obj.next_cursor}')
+        response = self.client.get(f'/profile/auth/?after='
+                                   f'{page_obj.next_cursor}')
+        self.assertEqual(len(response.context['page_obj']), PER_PAGE)
@@ -5,7 +5,7 @@ from django import forms
 from django.core.cache import cache
 from http import HTTPStatus
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
 
 User = get_user_model()
 FIRST_PAGE_POSTS = 10
@@ -127,6 +127,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        cache.clear()
         self.user = PaginatorViewsTest.user
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -230,3 +231,43 @@ class FollowTest(TestCase):
         response = self.client.get(reverse('posts:follow_index'))
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertContains(response, 'new_post')
+
+
+class CommentsPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        for number in range(25):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий {number}')
+        self.client = Client()
+
+    def test_detail_shows_first_batch(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+
+    def test_fragment_continues_from_cursor(self):
+        """Фрагмент отдаёт следующую порцию в HTML и JSON."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        after = first.context['comments'].next_cursor
+        url = reverse('posts:post_comments', args=[self.post.id])
+        response = self.client.get(url, {'after': after})
+        self.assertContains(response, 'Комментарий 4')
+        self.assertContains(response, 'media-body', count=5)
+        self.assertNotContains(response, 'comments-more')
+        data = self.client.get(url, {'after': after, 'format': 'json'}).json()
+        self.assertEqual([item['text'] for item in data['comments']],
+                         [f'Комментарий {n}' for n in range(4, -1, -1)])
+        self.assertIsNone(data['next'])
+
+    def test_fragment_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.id + 100]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,71 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import warmup
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class WarmupTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='star')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(title='g', slug='g',
+                                          description='d')
+        Group.objects.create(title='empty', slug='empty', description='d')
+        self.post = Post.objects.create(author=self.author, text='Пост',
+                                        group=self.group)
+        Comment.objects.create(author=self.reader, post=self.post,
+                               text='Комментарий')
+
+    def test_hot_urls(self):
+        """Горячие адреса идут от популярных к остальным в пределах limit."""
+        self.assertEqual(warmup.hot_urls(1), [
+            reverse('posts:index'),
+            reverse('posts:trending'),
+            reverse('posts:group_posts', kwargs={'slug': 'g'}),
+            reverse('posts:profile', kwargs={'username': 'star'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ])
+
+    @mock.patch.object(warmup, 'is_useful', return_value=True)
+    def test_command_fills_cache(self, is_useful):
+        """После прогрева анонимные страницы не ходят в базу."""
+        out = StringIO()
+        call_command('warm_cache', workers=1, stdout=out, stderr=StringIO())
+        self.assertIn('Прогрето страниц: 7 из 7 (100%)', out.getvalue())
+        for url in [reverse('posts:index'),
+                    reverse('posts:profile', kwargs={'username': 'star'}),
+                    reverse('posts:post_detail',
+                            kwargs={'post_id': self.post.pk})]:
+            with self.subTest(url=url):
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_cache_is_skipped(self):
+        """С кешем в памяти процесса прогрев только предупреждает."""
+        err = StringIO()
+        with mock.patch.object(warmup, 'warm') as warm:
+            call_command('warm_cache', stdout=StringIO(), stderr=err)
+        warm.assert_not_called()
+        self.assertIn('прогрев пропущен', err.getvalue())
+
+    def test_report_counts_failures(self):
+        """Отчёт показывает покрытие и ответы, отличные от 200."""
+        report = warmup.warm([reverse('posts:index'),
+                              reverse('posts:group_posts',
+                                      kwargs={'slug': 'missing'})], 1)
+        self.assertEqual((report.total, report.warmed), (2, 1))
+        self.assertIn('(50%)', warmup.describe(report))
+        self.assertIn('404: 1', warmup.describe(report))
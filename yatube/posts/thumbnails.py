@@ -0,0 +1,119 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Страницы не делают работу с изображениями: шаблоны только ищут готовую
+миниатюру в key-value хранилище sorl, а при промахе ставят исходник в
+очередь локального пула потоков и показывают заглушку. Новые картинки
+попадают в очередь сразу после сохранения поста. Готовая миниатюра
+сбрасывает страницы (и их снимки) постов с этой картинкой, а карточки
+с заглушкой в кеш не попадают.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# все геометрии, которые используют шаблоны
+GEOMETRIES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl, который только ищет готовую миниатюру."""
+
+    def lookup(self, file_, geometry_string, **options):
+        # опции собираются так же, как в ThumbnailBackend.get_thumbnail,
+        # иначе имя миниатюры не совпадёт с построенной воркером
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+_backend = LookupBackend()
+
+
+def lookup(image, alias):
+    """Готовая миниатюра или None; никогда не открывает картинку."""
+    geometry, options = GEOMETRIES[alias]
+    return _backend.lookup(image, geometry, **options)
+
+
+def is_ready(image, alias='card'):
+    """Нет картинки или её миниатюра уже построена."""
+    return not image or lookup(image, alias) is not None
+
+
+def _invalidate(name):
+    # страницы, собранные до миниатюры, держат заглушку
+    scopes = {'index'}
+    for post in (Post.objects.filter(image=name)
+                 .select_related('author', 'group')):
+        scopes.add(f'post:{post.pk}')
+        scopes.add(f'user:{post.author.username}')
+        if post.group:
+            scopes.add(f'group:{post.group.slug}')
+    caching.bump(*scopes)
+
+
+def generate(name):
+    """Строит миниатюры всех геометрий для картинки name."""
+    for geometry, options in GEOMETRIES.values():
+        get_thumbnail(name, geometry, **options)
+    _invalidate(name)
+
+
+def _run(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+    finally:
+        _pending.discard(name)
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def _submit(name):
+    if name in _pending:
+        return
+    _pending.add(name)
+    _get_executor().submit(_run, name)
+
+
+def schedule(name):
+    """Ставит картинку в очередь после коммита текущей транзакции."""
+    if name and settings.THUMBNAIL_PREGENERATE:
+        transaction.on_commit(lambda: _submit(name))
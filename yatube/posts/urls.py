@@ -7,6 +7,10 @@ urlpatterns = [
     path('group/<slug:slug>/',
          views.group_posts,
          name='group_posts'),
+    path('group/<slug:slug>/trending/',
+         views.group_trending,
+         name='group_trending'),
+    path('trending/', views.trending, name='trending'),
     path('profile/<str:username>/',
          views.profile,
          name='profile'),
@@ -19,10 +23,24 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/',
          views.post_edit,
          name='edit_post'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    path('profile/<str:username>/export/',
+         views.export_author,
+         name='export_author'),
+    path('group/<slug:slug>/export/',
+         views.export_group,
+         name='export_group'),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/followers/',
+         views.profile_followers, name='profile_followers'),
+    path('profile/<str:username>/following/',
+         views.profile_following, name='profile_following'),
     path('profile/<str:username>/follow/',
          views.profile_follow, name='profile_follow'),
     path('profile/<str:username>/unfollow/',
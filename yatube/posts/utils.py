@@ -1,7 +1,228 @@
+import base64
+import binascii
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj, fields):
+    """Упаковывает значения полей ключа в непрозрачный токен."""
+    parts = []
+    for field in fields:
+        value = getattr(obj, field)
+        parts.append(value.isoformat() if hasattr(value, 'isoformat')
+                     else str(value))
+    raw = '|'.join(parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (дата, id) из токена или None, если токен битый."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.rsplit('|', 1)
+        value = parse_datetime(date_part)
+        pk = int(pk_part)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage:
+    """Страница keyset-пагинации.
+
+    Повторяет ту часть интерфейса Page, которой пользуются шаблоны,
+    но вместо номеров страниц отдаёт токены соседних страниц.
+    """
+    is_cursor = True
+    paginator = None
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _merge(first, second, key, reverse):
+    """Слияние двух выборок по ключу; запись из first важнее дубля."""
+    seen = {obj.pk for obj in first}
+    rows = first + [obj for obj in second if obj.pk not in seen]
+    rows.sort(key=key, reverse=reverse)
+    return rows
+
+
+class WithTail:
+    """Queryset и хвост из другого хранилища одной лентой для Paginator.
+
+    Хвост (posts.archive.ArchivedPosts) отдаёт count(), max_key() и
+    slice(offset, limit). Пока хвост целиком старше queryset, страница -
+    срез queryset и продолжение из хвоста по смещению. Если хранилища
+    перекрываются (старые посты импортировали после архивации), первые
+    stop записей обоих сливаются по ключу (дата, id).
+    """
+
+    def __init__(self, queryset, tail, date_field='pub_date',
+                 id_field='id'):
+        self.queryset = queryset
+        self.tail = tail
+        self.fields = (date_field, id_field)
+        self._head_count = None
+        self._overlap = None
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _count_head(self):
+        if self._head_count is None:
+            self._head_count = self.queryset.count()
+        return self._head_count
+
+    def _overlaps(self):
+        if self._overlap is None:
+            newest = self.tail.max_key()
+            oldest = None
+            if newest is not None:
+                oldest = (self.queryset.order_by(*self.fields)
+                          .values_list(*self.fields).first())
+            self._overlap = oldest is not None and newest > tuple(oldest)
+        return self._overlap
+
+    def count(self):
+        return self._count_head() + self.tail.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if self._overlaps():
+            rows = _merge(list(self.queryset[:stop]),
+                          self.tail.slice(0, stop), self._key, True)
+            return rows[start:stop]
+        rows = list(self.queryset[start:stop])
+        if len(rows) < stop - start:
+            offset = max(0, start - self._count_head())
+            rows += self.tail.slice(offset, stop - start - len(rows))
+        return rows
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (date_field, id_field) в порядке убывания.
+
+    Не делает COUNT(*) и OFFSET: любая страница стоит один запрос
+    с LIMIT per_page + 1 по индексу, как и первая. Необязательный tail -
+    записи той же ленты в другом хранилище (методы max_key(),
+    older(ключ, limit) и newer(ключ, limit)); они сливаются со страницей
+    по ключу, и к ним обращаются, только когда самая новая запись хвоста
+    может попасть на страницу.
+    """
+
+    def __init__(self, queryset, per_page, date_field='pub_date',
+                 id_field='id', tail=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.date_field = date_field
+        self.id_field = id_field
+        self.fields = (date_field, id_field)
+        self.tail = tail
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _tail_reaches(self, key):
+        """Есть ли в хвосте записи новее key (None - любые)."""
+        newest = self.tail.max_key()
+        return newest is not None and (key is None or newest > key)
+
+    def _after(self, value, pk):
+        return (Q(**{f'{self.date_field}__lt': value})
+                | Q(**{self.date_field: value, f'{self.id_field}__lt': pk}))
+
+    def _before(self, value, pk):
+        return (Q(**{f'{self.date_field}__gt': value})
+                | Q(**{self.date_field: value, f'{self.id_field}__gt': pk}))
+
+    def get_page(self, after=None, before=None):
+        newest_first = ('-' + self.date_field, '-' + self.id_field)
+        oldest_first = (self.date_field, self.id_field)
+        after_key = decode_cursor(after)
+        before_key = None if after_key else decode_cursor(before)
+        limit = self.per_page + 1
+
+        if before_key:
+            rows = list(self.queryset.filter(self._before(*before_key))
+                        .order_by(*oldest_first)[:limit])
+            if self.tail is not None and self._tail_reaches(before_key):
+                rows = _merge(rows, self.tail.newer(before_key, limit),
+                              self._key, False)[:limit]
+            has_more_newer = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_more_older = True
+        else:
+            queryset = self.queryset
+            if after_key:
+                queryset = queryset.filter(self._after(*after_key))
+            rows = list(queryset.order_by(*newest_first)[:limit])
+            # полная страница уже есть: хвост нужен, только если он
+            # новее её последней записи
+            bound = self._key(rows[-1]) if len(rows) == limit else None
+            if self.tail is not None and self._tail_reaches(bound):
+                rows = _merge(rows, self.tail.older(after_key, limit),
+                              self._key, True)[:limit]
+            has_more_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_more_newer = after_key is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_more_older:
+            next_cursor = encode_cursor(rows[-1], self.fields)
+        if rows and has_more_newer:
+            previous_cursor = encode_cursor(rows[0], self.fields)
+        return CursorPage(rows, next_cursor, previous_cursor)
 
 
-def create_pagination(request, posts, NUM_OF_POSTS):
-    paginator = Paginator(posts, NUM_OF_POSTS)
+def create_pagination(request, posts, NUM_OF_POSTS, date_field='pub_date',
+                      id_field='id', tail=None):
+    # Старые ссылки вида ?page=N продолжают работать через Paginator,
+    # всё остальное листается курсором без COUNT(*) и OFFSET.
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if settings.POSTS_PAGINATION_MODE != 'cursor' or page_number:
+        if tail is not None:
+            posts = WithTail(posts, tail, date_field, id_field)
+        paginator = Paginator(posts, NUM_OF_POSTS)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, NUM_OF_POSTS, date_field, id_field,
+                                tail)
+    return paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
@@ -1,30 +1,53 @@
+from django.core.paginator import Paginator
 from django.shortcuts import render, redirect
-from django.views.decorators.cache import cache_page
 from .models import Post, Group, User, Follow
 from django.shortcuts import get_object_or_404
 from .forms import PostForm, CommentForm
 from .utils import create_pagination
+from .feed import feed_posts
+from . import graph
+from .counters import user_stats
+from . import archive, detail, ranking, suggestions
+from .search import is_capped, search as search_posts
+from .caching import cached_page
 from django.contrib.auth.decorators import login_required
+from django.utils.http import urlencode
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import IntegrityError, router, transaction
+from . import export
 
 NUM_OF_POSTS = 10
+NUM_OF_USERS = 50
 
 
-@cache_page(20, key_prefix='index_page')
+def _post_scopes(kwargs):
+    # на странице поста есть и число постов автора
+    return detail.scopes(kwargs['post_id'],
+                         detail.author_username(kwargs['post_id']))
+
+
+@cached_page('index')
 def index(request):
-    posts = Post.objects.all()
-    page_obj = create_pagination(request, posts, NUM_OF_POSTS)
+    posts = Post.objects.for_listing()
+    page_obj = create_pagination(request, posts, NUM_OF_POSTS,
+                                 tail=archive.ArchivedPosts())
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cached_page('group:{slug}')
 def group_posts(request, slug):
 
     group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.all()
+    posts = group.group_posts.for_listing()
 
-    page_obj = create_pagination(request, posts, NUM_OF_POSTS)
+    page_obj = create_pagination(
+        request, posts, NUM_OF_POSTS,
+        tail=archive.ArchivedPosts(group_id=group.pk))
 
     context = {
         'group': group,
@@ -33,48 +56,109 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cached_page('trending')
+def trending(request):
+    context = {
+        'posts': ranking.top(),
+        'trending': True,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@cached_page('trending', 'group:{slug}')
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    context = {
+        'group': group,
+        'posts': ranking.top(group),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@cached_page('user:{username}', 'suggestions', 'suggestions:{viewer}')
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(User.objects.select_related('stats'),
+                             username=username)
     user_id = user.id
     posts = Post.objects.filter(author=user_id)
 
-    page_obj = create_pagination(request, posts, NUM_OF_POSTS)
+    page_obj = create_pagination(
+        request, posts.for_listing(), NUM_OF_POSTS,
+        tail=archive.ArchivedPosts(author_id=user_id))
+    stats = user_stats(user)
     follow = True
     if request.user.is_authenticated and request.user.id != user_id:
-        follow = Follow.objects.filter(user=request.user.id,
-                                       author=user_id).exists()
+        follow = graph.is_following(request.user.id, user_id)
     context = {
         'author': user,
         'name': username,
         'page_obj': page_obj,
-        'post_count': len(posts),
+        'post_count': stats.posts_count,
+        'stats': stats,
         'id': user_id,
         'following': follow,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cached_page(_post_scopes)
 def post_detail(request, post_id):
-    username = Post.objects.get(pk=post_id).author
-    post = get_object_or_404(Post,
-                             pk=post_id,
-                             author__username=username
-                             )
-    user = post.author
-    user_posts = user.posts.all()
-
+    post_detail = detail.load(post_id)
+    if post_detail is None:
+        raise Http404('Пост не найден')
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
 
     context = {
-        'post': post,
-        'count': user_posts.count(),
+        'post': post_detail.post,
+        'count': post_detail.author_posts,
+        'comments_count': post_detail.comments_count,
         'form': form,
-        'comments': comments,
+        'comments': post_detail.comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cached_page('post:{post_id}')
+def post_comments(request, post_id):
+    after = request.GET.get('after')
+    if Post.objects.filter(pk=post_id).exists():
+        comments = detail.comments_page(post_id, after)
+    else:
+        comments = archive.comments_page(post_id, after,
+                                         detail.NUM_OF_COMMENTS)
+        if comments is None:
+            raise Http404('Пост не найден')
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.id,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created,
+            } for comment in comments],
+            'next': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': comments,
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = search_posts(query)
+    paginator = Paginator(results, NUM_OF_POSTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'capped': is_capped(results, paginator.count),
+        'extra_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     username = get_object_or_404(User, pk=request.user.id)
@@ -128,25 +212,94 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = create_pagination(request, post_list, NUM_OF_POSTS)
-    return render(request, 'posts/follow.html', {'page_obj': page_obj})
+    post_list = feed_posts(request.user).for_listing()
+    page_obj = create_pagination(request, post_list, NUM_OF_POSTS,
+                                 'feed_date', 'feed_post')
+    context = {
+        'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
+    }
+    return render(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user != author and not (Follow.
-                                       objects.
-                                       filter(
-            user=request.user.id,
-            author=author.id).exists()):
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        # уникальный индекс (user, author) надёжнее кеша графа
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            # уже подписан
+            pass
     return redirect('posts:profile', username=username)
 
 
+def _follow_list(request, username, direction):
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    if direction == graph.FOLLOWERS:
+        ids = graph.followers(author.id)
+    else:
+        ids = graph.following(author.id)
+    page_obj = Paginator(ids, NUM_OF_USERS).get_page(request.GET.get('page'))
+    users = User.objects.in_bulk(list(page_obj.object_list))
+    mutual = set(graph.mutual(author.id))
+    context = {
+        'author': author,
+        'direction': direction,
+        'page_obj': page_obj,
+        'users': [(users[user_id], user_id in mutual)
+                  for user_id in page_obj.object_list if user_id in users],
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@cached_page('user:{username}')
+def profile_followers(request, username):
+    return _follow_list(request, username, graph.FOLLOWERS)
+
+
+@cached_page('user:{username}')
+def profile_following(request, username):
+    return _follow_list(request, username, graph.FOLLOWING)
+
+
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+def _export_response(request, posts, name, archived):
+    fmt = request.GET.get('format', 'ndjson')
+    kind = request.GET.get('kind', 'posts')
+    if fmt not in export.FORMATS or kind not in export.KINDS:
+        return HttpResponseBadRequest('format: ndjson|csv, kind: '
+                                      'posts|comments')
+    # тяжёлое чтение - на реплику, если она есть
+    posts = posts.using(router.db_for_read(Post))
+    response = StreamingHttpResponse(
+        export.export(posts, kind, fmt, archived),
+        content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}-{kind}.{fmt}"')
+    return response
+
+
+@staff_member_required
+def export_author(request, username):
+    author = get_object_or_404(User, username=username)
+    return _export_response(request, Post.objects.filter(author=author),
+                            f'author-{author.username}',
+                            archive.ArchivedPosts(author_id=author.pk))
+
+
+@staff_member_required
+def export_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _export_response(request, Post.objects.filter(group=group),
+                            f'group-{group.slug}',
+                            archive.ArchivedPosts(group_id=group.pk))
@@ -0,0 +1,94 @@
+"""Прогрев кеша страниц после деплоя и перезапуска.
+
+Самые посещаемые страницы выбираются по данным: главная и обсуждаемое,
+группы с наибольшим числом постов, авторы с наибольшим числом
+подписчиков и самые обсуждаемые посты. Каждая рендерится анонимным
+GET через весь стек middleware (как снимки posts.snapshots), так что
+заполняются и страницы анонимов, и общие для всех кеши карточек и
+страницы поста.
+
+Прогрев помогает только с общим кешем (YATUBE_CACHE=sqlite/file, Redis):
+в LocMemCache страницы и данные постов живут LOCAL_CACHE_TIMEOUT
+секунд, и прогретое истекает раньше, чем пригодится. С ним и команда
+warm_cache, и прогрев в wsgi.py при YATUBE_WARM_CACHE только
+предупреждают и ничего не рендерят.
+"""
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+from django.db.models import Count
+from django.urls import reverse
+
+from . import ranking, snapshots
+from .models import Group, User
+
+WarmReport = namedtuple('WarmReport', 'total warmed statuses seconds')
+LOCAL_CACHE_WARNING = ('Кеш в памяти процесса живёт LOCAL_CACHE_TIMEOUT '
+                       'секунд: прогрев пропущен, он полезен только с '
+                       'общим кешем (YATUBE_CACHE=sqlite)')
+
+
+def is_useful():
+    """Переживёт ли прогрев старт: кеш общий, а не LocMemCache."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def hot_urls(limit):
+    """Адреса самых посещаемых страниц, самые горячие первыми."""
+    urls = [reverse('posts:index'), reverse('posts:trending')]
+    groups = (Group.objects.annotate(posts=Count('group_posts'))
+              .order_by('-posts', 'pk').values_list('slug', flat=True))
+    urls += [reverse('posts:group_posts', kwargs={'slug': slug})
+             for slug in groups[:limit]]
+    authors = (User.objects.order_by('-stats__followers_count', 'pk')
+               .values_list('username', flat=True))
+    urls += [reverse('posts:profile', kwargs={'username': username})
+             for username in authors[:limit]]
+    urls += [reverse('posts:post_detail', kwargs={'post_id': post.pk})
+             for post in ranking.top(limit=limit)]
+    return urls
+
+
+def _render(url):
+    try:
+        return snapshots.render(url).status_code
+    except Exception:
+        return 'error'
+
+
+def _render_in_thread(url):
+    try:
+        return _render(url)
+    finally:
+        close_old_connections()
+
+
+def warm(urls, workers):
+    """Рендерит urls не больше чем в workers потоков; WarmReport.
+
+    workers=1 - в текущем потоке.
+    """
+    started = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix='warmup') as pool:
+            statuses = Counter(pool.map(_render_in_thread, urls))
+    else:
+        statuses = Counter(map(_render, urls))
+    return WarmReport(total=len(urls), warmed=statuses[200],
+                      statuses=dict(statuses),
+                      seconds=time.perf_counter() - started)
+
+
+def describe(report):
+    coverage = report.warmed / report.total if report.total else 1
+    other = ', '.join(f'{status}: {count}'
+                      for status, count in report.statuses.items()
+                      if status != 200)
+    line = (f'Прогрето страниц: {report.warmed} из {report.total} '
+            f'({coverage:.0%}) за {report.seconds:.1f} с')
+    return f'{line}; прочие ответы - {other}' if other else line
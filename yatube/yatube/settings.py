@@ -50,7 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,10 +84,28 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
-CACHES = {
-    'default': {
+# Бэкенд кеша выбирается переменной окружения YATUBE_CACHE.
+# locmem - свой кеш у каждого процесса (страницы тогда живут не дольше
+# LOCAL_CACHE_TIMEOUT); sqlite - общий файл для всех
+# воркеров на машине (core/cache_backends.py); filebased - для сравнения
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'filebased': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'files'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
 }
 
 # Database
@@ -98,6 +118,28 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к копиям базы в YATUBE_REPLICAS через
+# запятую. Локально их обновляет manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(','))):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# сколько секунд после записи пользователь читает из основной базы,
+# и столько же не кешируются страницы после правок
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+# замеры запросов по view: заголовок Server-Timing и страница /perf/
+PERFORMANCE_METRICS = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -148,3 +190,79 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# 'cursor' - keyset-пагинация лент по (pub_date, id) без COUNT(*),
+# 'offset' - классический Paginator с номерами страниц
+POSTS_PAGINATION_MODE = 'cursor'
+
+# Лента подписок: сколько записей храним на пользователя и с какого
+# числа подписчиков автор переходит из fan-out на чтение из posts_post
+FEED_MAX_LENGTH = 1000
+FEED_FANOUT_LIMIT = 5000
+
+# Кеш страниц по поколениям (posts.caching): страницы живут долго,
+# а устаревают при смене поколения. LOCK_TIMEOUT - сколько держится
+# замок на пересборку холодной страницы, WAIT - сколько её ждут другие
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# с LocMemCache поколения не общие для воркеров: страницы и данные
+# поста живут не дольше этого, иначе правка видна не во всех процессах
+LOCAL_CACHE_TIMEOUT = 20
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_WAIT = 2
+
+# Отрендеренные карточки постов (posts/templatetags/post_cards.py)
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Рейтинг обсуждаемых постов (posts/ranking.py): вклад комментария
+# вдвое слабеет за HALF_LIFE секунд, сам пост весит как POST_WEIGHT
+# свежих комментариев. Полный пересчёт - manage.py rank_posts
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_POST_WEIGHT = 3
+TRENDING_SIZE = 20
+
+# Рекомендации «кого почитать» (posts/suggestions.py), пересчёт -
+# manage.py suggest_follows. PER_USER хранится, SHOWN показывается
+SUGGESTIONS_PER_USER = 20
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_NEIGHBOURS = 50
+SUGGESTIONS_FANIN_LIMIT = 1000
+SUGGESTIONS_COFOLLOW_WEIGHT = 2
+
+# Статические снимки страниц для анонимов (posts/snapshots.py): после
+# правок перерисовываются в фоне, отдаются веб-сервером из SNAPSHOTS_ROOT
+# или обёрткой SnapshotApp в wsgi.py. Первичная выкладка -
+# manage.py publish_snapshots
+SNAPSHOTS_ENABLED = bool(os.environ.get('YATUBE_SNAPSHOTS'))
+SNAPSHOTS_ROOT = os.path.join(BASE_DIR, 'snapshots')
+SNAPSHOTS_GZIP = True
+SNAPSHOTS_HOST = 'localhost'
+# сколько профилей и постов выкладывает publish_snapshots
+SNAPSHOTS_LIMIT = 1000
+
+# Архив старых постов (posts/archive.py): посты старше AFTER_DAYS
+# переезжают в отдельный файл SQLite командой manage.py archive_posts
+ARCHIVE_PATH = os.path.join(BASE_DIR, 'archive.sqlite3')
+ARCHIVE_AFTER_DAYS = 365
+
+# Прогрев кеша после деплоя (posts/warmup.py): manage.py warm_cache или
+# YATUBE_WARM_CACHE - прогрев в wsgi.py до первого запроса. Имеет смысл
+# только с общим кешем (YATUBE_CACHE=sqlite, Redis), с LocMemCache
+# пропускается
+CACHE_WARM_ON_STARTUP = bool(os.environ.get('YATUBE_WARM_CACHE'))
+CACHE_WARM_LIMIT = 20
+CACHE_WARM_WORKERS = 4
+
+# Собранные данные страницы поста (posts/detail.py)
+POST_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры строятся в фоне сразу после загрузки (posts/thumbnails.py),
+# страницы только читают готовые из key-value хранилища sorl
+THUMBNAIL_PREGENERATE = True
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются и пересохраняются без метаданных
+# (posts/images.py); WEBP используется, только если его умеет Pillow
+IMAGE_MAX_SIDE = 2048
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 85
+IMAGE_KEEP_ORIGINAL = False
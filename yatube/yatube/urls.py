@@ -19,6 +19,8 @@ from django.urls import include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import performance
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -26,6 +28,7 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('perf/', performance, name='performance'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -8,9 +8,28 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
 import os
+import sys
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.CACHE_WARM_ON_STARTUP:
+    # греем общий кеш до первого запроса; LocMemCache истечёт раньше
+    from posts import warmup
+
+    if warmup.is_useful():
+        report = warmup.warm(warmup.hot_urls(settings.CACHE_WARM_LIMIT),
+                             settings.CACHE_WARM_WORKERS)
+        print(warmup.describe(report), file=sys.stderr)
+    else:
+        print(warmup.LOCAL_CACHE_WARNING, file=sys.stderr)
+
+if settings.SNAPSHOTS_ENABLED:
+    # анонимам готовые страницы отдаются с диска, мимо Django
+    from posts.snapshots import SnapshotApp
+
+    application = SnapshotApp(application)